@@ -1 +1,5 @@
+# from envelopes import MultiAdsr
+# from pulsar import PolyPulsar
+# from tablebank import TableBank, BandLimitedOsc
+# from tablecache import tableCache, diskCache, sharedEnvelopeTable, sharedWaveTable
 # from tritable import TriTable
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# This is an envelope generator for pyo <http://code.google.com/p/pyo>.
+# Latest version always available at <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+from pyo import PyoObject, Adsr, Server, Sine, convertArgsToLists
+from pyo.lib._core import wrap
+
+
+class EnvelopeOutput(PyoObject):
+    """
+    One output of a `MultiAdsr`.
+
+    A view on some of the envelope's streams, with a `mul` and segments of
+    its own; usable wherever a PyoObject is expected. `output['trig']` lists
+    the end-of-envelope triggers of its streams.
+
+    :Parent: :py:class:`PyoObject`
+
+    """
+    def __init__(self, streams, trigs, attack, decay, sustain, release,
+                 mul=1):
+        PyoObject.__init__(self)
+        self._base_objs = streams
+        self._trig_objs = trigs
+        self._attack = attack
+        self._decay = decay
+        self._sustain = sustain
+        self._release = release
+        self.setMul(mul)
+
+    def setAttack(self, x):
+        """Replace the `attack` attribute."""
+        self._attack = x
+        [obj.setAttack(x) for obj in self._base_objs]
+
+    def setDecay(self, x):
+        """Replace the `decay` attribute."""
+        self._decay = x
+        [obj.setDecay(x) for obj in self._base_objs]
+
+    def setSustain(self, x):
+        """Replace the `sustain` attribute."""
+        self._sustain = x
+        [obj.setSustain(x) for obj in self._base_objs]
+
+    def setRelease(self, x):
+        """Replace the `release` attribute."""
+        self._release = x
+        [obj.setRelease(x) for obj in self._base_objs]
+
+    @property
+    def attack(self):
+        """float. Duration of the attack phase in seconds."""
+        return self._attack
+
+    @attack.setter
+    def attack(self, x):
+        self.setAttack(x)
+
+    @property
+    def decay(self):
+        """float. Duration of the decay phase in seconds."""
+        return self._decay
+
+    @decay.setter
+    def decay(self, x):
+        self.setDecay(x)
+
+    @property
+    def sustain(self):
+        """float. Amplitude of the sustain phase."""
+        return self._sustain
+
+    @sustain.setter
+    def sustain(self, x):
+        self.setSustain(x)
+
+    @property
+    def release(self):
+        """float. Duration of the release phase in seconds."""
+        return self._release
+
+    @release.setter
+    def release(self, x):
+        self.setRelease(x)
+
+    def __dir__(self):
+        return ["attack", "decay", "sustain", "release", "mul", "add"]
+
+
+class MultiAdsr(PyoObject):
+    """
+    Several ADSR envelopes, started and stopped together, as one object.
+
+    Every list among `attack`, `decay`, `sustain`, `release` and `scale`
+    gives one output per element, each with its own segment times, sustain
+    level and gain; `output(i)` returns output `i`, whose segments can be
+    changed on their own. All of them are computed
+    by a single `Adsr`, one stream per output (and per duration, if `dur` is
+    a list too), and are triggered by a single `play`. The gains are the
+    outputs' `mul`, so scaling an envelope costs no extra object.
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        attack, decay, release : float or list, optional
+            Segment durations in seconds. Default to 0.01, 0.05 and 0.1.
+        sustain : float or list, optional
+            Sustain levels, between 0 and 1. Defaults to 0.707.
+        dur : float or list, optional
+            Total durations in seconds; 0 holds the sustain until `stop`.
+            Defaults to 0.
+        scale : float or list, optional
+            Output gains, which can be changed later on through each
+            output's `mul`. Defaults to 1.
+
+    >>> env = MultiAdsr([1.28, 0.577], 0.097, [0.53, 1.0], [0.577, 1.28],
+    ...                 dur=2.0, scale=[0.7079, 1.0])
+    >>> filt = EQ(saw, freq=1300, q=100, type=1, mul=env.output(0))
+    >>> amp = filt * env.output(1)
+
+    """
+    def __init__(self, attack=0.01, decay=0.05, sustain=0.707, release=0.1,
+                 dur=0, scale=1):
+        PyoObject.__init__(self)
+        self._dur = dur
+        self._scale = scale
+
+        attack, decay, sustain, release, scale, outputs = convertArgsToLists(
+            attack, decay, sustain, release, scale)
+        dur, durs = convertArgsToLists(dur)
+        self._outputs = outputs
+        self._durs = durs
+
+        # Streams are stored output by output, every duration of each.
+        streams = range(outputs * durs)
+        self._adsr = Adsr([wrap(attack, i // durs) for i in streams],
+                          [wrap(decay, i // durs) for i in streams],
+                          [wrap(sustain, i // durs) for i in streams],
+                          [wrap(release, i // durs) for i in streams],
+                          dur=[wrap(dur, i % durs) for i in streams])
+        self._base_objs = self._adsr.getBaseObjects()
+        self._trig_objs = self._adsr['trig']
+
+        trigs = self._trig_objs.getBaseObjects()
+        self._views = []
+        for i in range(outputs):
+            first, last = i * durs, (i + 1) * durs
+            self._views.append(EnvelopeOutput(
+                self._base_objs[first:last], trigs[first:last],
+                wrap(attack, i), wrap(decay, i), wrap(sustain, i),
+                wrap(release, i), wrap(scale, i)))
+
+    def output(self, i):
+        """Return output `i`, as a PyoObject."""
+        return self._views[i]
+
+    def setDur(self, x):
+        """
+        Replace the `dur` attribute.
+
+        :Args:
+
+            x : float or list
+                New `dur` attribute.
+
+        """
+        self._dur = x
+        x, durs = convertArgsToLists(x)
+        for i, obj in enumerate(self._base_objs):
+            obj.setDur(wrap(x, i % self._durs))
+
+    @property
+    def dur(self):
+        """float or list. Total durations in seconds."""
+        return self._dur
+
+    @dur.setter
+    def dur(self, x):
+        self.setDur(x)
+
+    @property
+    def outputs(self):
+        """int. Number of outputs."""
+        return self._outputs
+
+    def __dir__(self):
+        return ["dur"]
+
+    def play(self, dur=0, delay=0):
+        self._adsr.play(dur, delay)
+        return self
+
+    def stop(self, wait=0):
+        self._adsr.stop(wait)
+        return self
+
+# Run this script to hear two outputs of a MultiAdsr.
+if __name__ == "__main__":
+    s = Server(duplex=0).boot()
+    s.setAmp(0.2)
+    s.start()
+    env = MultiAdsr([0.01, 1.0], 0.1, [0.5, 1.0], [0.5, 1.0], dur=3)
+    a = Sine([300, 301], mul=[env.output(0), env.output(1)]).out()
+    env.play()
+    s.gui(locals())
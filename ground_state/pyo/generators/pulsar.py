@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# This is a polyphonic pulsar generator for pyo <http://code.google.com/p/pyo>.
+# Latest version always available at <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+from pyo import PyoObject, Mix, Pulsar, Randi, Sig
+
+
+class PolyPulsar(PyoObject):
+    """
+    Polyphonic pulsar synthesis, as in Cecilia's Pulsar module.
+
+    Every ratio of `ratios` gives three voices at `freq * ratio`: one dry
+    voice per channel, and two detuned ones, each following one stream of
+    a shared jitter bank (two `Randi`s). Rather than two or three arithmetic
+    objects per voice, the dry frequencies are one `Sig` with a stream per
+    ratio, and the detuned ones a single product of those by the jitter
+    bank, so the number of objects doesn't grow with the voices; only
+    their streams do.
+
+    Signal chain:
+    freq * ratios -------------------------> pulsar -> mix -> out
+    |                                          ^
+    freq * ratios * jitter bank (2 streams) -->|
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        table : PyoTableObject
+            Waveform of the pulses.
+        env : PyoTableObject
+            Envelope (window) of the pulses.
+        freq : float or PyoObject, optional
+            Base frequency in Hz. Defaults to 100.
+        ratios : list, optional
+            Frequency ratio of every voice. Defaults to [1].
+        detune : float or PyoObject, optional
+            Depth of the jitter, as a fraction of the frequency. Defaults to
+            0.005.
+        detunesp : float or PyoObject, optional
+            Speed of the jitter in Hz. Defaults to 0.3.
+        frac : float or PyoObject, optional
+            Part of each period taken by the pulse. Defaults to 0.5.
+        interp : int, optional
+            Table interpolation, as for `Pulsar`. Defaults to 4.
+        chnls : int, optional
+            Number of output channels. Defaults to 2.
+
+    >>> p = PolyPulsar(HarmTable([1, 0.5]), WinTable(7), 100,
+    ...                ratios=[1, 1.5, 2.01], chnls=2, mul=0.1).out()
+
+    """
+    def __init__(self, table, env, freq=100, ratios=[1], detune=0.005,
+                 detunesp=0.3, frac=0.5, interp=4, chnls=2, mul=1, add=0):
+        PyoObject.__init__(self, mul, add)
+        self._table = table
+        self._env = env
+        self._freq = freq
+        self._ratios = list(ratios)
+        self._detune = detune
+        self._detunesp = detunesp
+        self._frac = frac
+        self._chnls = chnls
+        self._mul = mul
+        self._add = add
+
+        voices = len(self._ratios)
+        # The jitter bank; a list `mul` gives one (independent) stream per
+        # element.
+        self._jitter = Randi(min=1 - detune, max=1 + detune, freq=detunesp,
+                             mul=[1, 1])
+        # One stream per ratio.
+        self._dry = Sig(freq, mul=self._ratios)
+        # Every ratio detuned by the first jitter stream, then every ratio
+        # by the second.
+        jitter = self._jitter.getBaseObjects()
+        self._wet = self._dry * ([jitter[0]] * voices + [jitter[1]] * voices)
+        dry = self._dry.getBaseObjects()
+        freqs = ([dry[i] for i in range(voices) for j in range(chnls)] +
+                 self._wet.getBaseObjects())
+        self._pulsar = Pulsar(table, env, freq=freqs, frac=frac, phase=0,
+                              interp=interp)
+        self._mix = Mix(self._pulsar, voices=chnls, mul=self._mul,
+                        add=self._add)
+        self._base_objs = self._mix.getBaseObjects()
+
+    def setFreq(self, x):
+        """
+        Replace the `freq` attribute.
+
+        :Args:
+
+            x : float or PyoObject
+                New `freq` attribute.
+
+        """
+        self._freq = x
+        self._dry.value = x
+
+    def setDetune(self, x):
+        """
+        Replace the `detune` attribute.
+
+        :Args:
+
+            x : float or PyoObject
+                New `detune` attribute.
+
+        """
+        self._detune = x
+        self._jitter.min = 1 - x
+        self._jitter.max = 1 + x
+
+    def setDetunesp(self, x):
+        """
+        Replace the `detunesp` attribute.
+
+        :Args:
+
+            x : float or PyoObject
+                New `detunesp` attribute.
+
+        """
+        self._detunesp = x
+        self._jitter.freq = x
+
+    def setFrac(self, x):
+        """
+        Replace the `frac` attribute.
+
+        :Args:
+
+            x : float or PyoObject
+                New `frac` attribute.
+
+        """
+        self._frac = x
+        self._pulsar.frac = x
+
+    @property
+    def freq(self):
+        """float or PyoObject. Base frequency in Hz."""
+        return self._freq
+
+    @freq.setter
+    def freq(self, x):
+        self.setFreq(x)
+
+    @property
+    def detune(self):
+        """float or PyoObject. Depth of the jitter."""
+        return self._detune
+
+    @detune.setter
+    def detune(self, x):
+        self.setDetune(x)
+
+    @property
+    def detunesp(self):
+        """float or PyoObject. Speed of the jitter in Hz."""
+        return self._detunesp
+
+    @detunesp.setter
+    def detunesp(self, x):
+        self.setDetunesp(x)
+
+    @property
+    def frac(self):
+        """float or PyoObject. Part of each period taken by the pulse."""
+        return self._frac
+
+    @frac.setter
+    def frac(self, x):
+        self.setFrac(x)
+
+    @property
+    def ratios(self):
+        """list. Frequency ratio of every voice."""
+        return self._ratios
+
+    @property
+    def voices(self):
+        """int. Number of pulsar streams."""
+        return len(self._pulsar)
+
+    def __dir__(self):
+        return ["freq", "detune", "detunesp", "frac", "mul", "add"]
+
+
+def _plyPulsar(table, env, freq, ratios, detune, detunesp, frac, chnls):
+    # Cecilia's Pulsar module as it builds its voices, kept for the report.
+    rnd1 = Randi(min=1 - detune, max=1 + detune, freq=detunesp)
+    rnd2 = Randi(min=1 - detune, max=1 + detune, freq=detunesp)
+    ply1 = [freq * i * rnd1 for i in ratios]
+    ply2 = [freq * i * rnd2 for i in ratios]
+    ply3 = [freq * i for i in ratios for j in range(chnls)]
+    pul = Pulsar(table, env, freq=ply3 + ply1 + ply2, frac=frac, phase=0,
+                 interp=4)
+    return Mix(pul, voices=chnls), locals()
+
+
+def pulsarReport(server, voices=(1, 4, 16, 64), chnls=2):
+    """
+    Return, for every voice count, the Python objects and audio streams
+    built by Cecilia's Pulsar module and by `PolyPulsar`, as a dict of
+    {voices: {'ply': (objects, streams), 'poly': (objects, streams)}}.
+
+    """
+    import gc
+    from pyo import HarmTable, PyoObjectBase, WinTable
+
+    def count(build):
+        gc.collect()
+        before = server.getNumberOfStreams()
+        objects = len([o for o in gc.get_objects()
+                       if isinstance(o, PyoObjectBase)])
+        built = build()
+        gc.collect()
+        objects = len([o for o in gc.get_objects()
+                       if isinstance(o, PyoObjectBase)]) - objects
+        streams = server.getNumberOfStreams() - before
+        del built
+        gc.collect()
+        return objects, streams
+
+    table = HarmTable([1, 0.5, 0.333])
+    env = WinTable(7)
+    freq = Sig(100)
+    detune = Sig(0.005)
+    detunesp = Sig(0.3)
+    report = {}
+    for n in voices:
+        ratios = [1 + 0.01 * i for i in range(n)]
+        report[n] = {
+            'ply': count(lambda: _plyPulsar(table, env, freq, ratios, detune,
+                                            detunesp, 0.5, chnls)),
+            'poly': count(lambda: PolyPulsar(table, env, freq, ratios,
+                                             detune, detunesp, 0.5,
+                                             chnls=chnls))}
+    return report
+
+
+# Run this script to compare the objects built for Cecilia's Pulsar voices.
+if __name__ == "__main__":
+    from pyo import Server
+
+    s = Server(audio='manual', duplex=0).boot()
+    for n, counts in sorted(pulsarReport(s).items()):
+        print("{0:>3} ratios: {1[ply][0]:>4} objects, {1[ply][1]:>4} streams "
+              "-> {1[poly][0]:>2} objects, {1[poly][1]:>4} streams"
+              .format(n, counts))
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# This is a utility module for pyo <http://code.google.com/p/pyo>, which shares
+# generated wavetables and envelope tables between instrument instances, and
+# keeps them on disk between processes.
+# Latest version always available at <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+import hashlib
+import os
+import tempfile
+import weakref
+
+import numpy as np
+
+from pyo import (CosTable, DataTable, HarmTable, LinTable, SawTable,
+                 SquareTable)
+from pyo.lib._core import USE_DOUBLE
+
+# Bytes per table sample; pyo64 stores doubles.
+SAMPLE_BYTES = 8 if USE_DOUBLE else 4
+SAMPLE_FORMAT = 'float64' if USE_DOUBLE else 'float32'
+# Directory of the on-disk cache, unless $GROUND_STATE_TABLES says otherwise
+# (an empty value turns it off).
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'ground_state',
+                         'tables')
+# Part of every on-disk key; bump it whenever a generator draws differently.
+CACHE_VERSION = 1
+
+
+def _sawTable(order, size):
+    return SawTable(order=order, size=size)
+
+
+def _squareTable(order, size):
+    return SquareTable(order=order, size=size)
+
+
+def _triTable(order, size):
+    # Imported here; `TriTable` itself asks this module for its table.
+    from ground_state.pyo.generators.tritable import TriTable
+    return HarmTable(TriTable._create_list(order), size)
+
+
+# Maps a shape name to a callable building a (not normalized) table.
+SHAPES = {'saw': _sawTable,
+          'square': _squareTable,
+          'tri': _triTable}
+
+# Maps an interpolation name to the class drawing a breakpoint envelope.
+ENVELOPES = {'cos': CosTable,
+             'linear': LinTable}
+
+
+def tableBytes(table):
+    """Return the memory held by `table`'s samples, in bytes."""
+    sizes = table.getSize()
+    if not isinstance(sizes, list):
+        sizes = [sizes]
+    # pyo allocates one guard point after every table.
+    return sum(size + 1 for size in sizes) * SAMPLE_BYTES
+
+
+class TableCache(object):
+    """
+    TableCache 1.0
+
+    A keyed registry of shared wavetables.
+
+    Every distinct key maps to a single table, built on the first request for
+    it. Each request adds a reference to the key; once the last reference is
+    released, the table is evicted. Tables handed out by the cache are shared
+    between every instrument asking for the same key, so they must be treated
+    as read-only.
+
+    If an `owner` is given when acquiring, the reference is released
+    automatically when the owner is garbage collected.
+
+    >>> cache = TableCache()
+    >>> t = cache.acquire(('saw', 50, 24000, True),
+    ...                   lambda: SawTable(50, 24000).normalize())
+
+    """
+    def __init__(self):
+        self._tables = {}
+        self._refs = {}
+
+    def acquire(self, key, factory, owner=None, persist=False):
+        """
+        Return the table stored under `key`, building it if needed.
+
+        :Args:
+
+            key : hashable
+                Key identifying the table contents.
+            factory : callable
+                Called without arguments to build the table on a miss.
+            owner : object, optional
+                The reference is released when `owner` is garbage collected.
+            persist : bool, optional
+                On a miss, read the table from the on-disk cache (`diskCache`)
+                instead of building it, if it is there; otherwise, build it
+                and store it there. Only for keys made of plain values
+                (numbers, strings, tuples of them) that fully determine the
+                table's samples. Defaults to False.
+
+        """
+        table = self._tables.get(key)
+        if table is None:
+            if persist:
+                table = diskCache.restore(key, factory)
+            else:
+                table = factory()
+            self._tables[key] = table
+            self._refs[key] = 0
+        self._refs[key] += 1
+        if owner is not None:
+            weakref.finalize(owner, self.release, key)
+        return table
+
+    def release(self, key):
+        """
+        Drop one reference to `key`; evict its table if it was the last one.
+
+        :Args:
+
+            key : hashable
+                Key passed to `acquire`.
+
+        """
+        if key not in self._refs:
+            return
+        self._refs[key] -= 1
+        if self._refs[key] <= 0:
+            del self._refs[key]
+            del self._tables[key]
+
+    def refCount(self, key):
+        """Return the number of live references to `key`."""
+        return self._refs.get(key, 0)
+
+    def stats(self):
+        """Return a dict mapping every cached key to its reference count."""
+        return dict(self._refs)
+
+    def tables(self):
+        """Return a list of every cached table."""
+        return list(self._tables.values())
+
+    def report(self):
+        """
+        Return the memory saved by sharing, as a dict with, per key kind
+        ('wave', 'env'...), the number of 'tables' held and the number of
+        'references' to them, and the 'bytes' held against the bytes one
+        private table per reference would hold ('unshared').
+
+        """
+        report = {}
+        for key, table in self._tables.items():
+            entry = report.setdefault(key[0], {'tables': 0, 'references': 0,
+                                               'bytes': 0, 'unshared': 0})
+            size = tableBytes(table)
+            entry['tables'] += 1
+            entry['references'] += self._refs[key]
+            entry['bytes'] += size
+            entry['unshared'] += size * self._refs[key]
+        return report
+
+    def clear(self):
+        """
+        Forget every cached table.
+
+        Needed after the server has been shut down, since tables built under
+        the old server are no longer valid.
+
+        """
+        self._tables.clear()
+        self._refs.clear()
+
+    def __len__(self):
+        return len(self._tables)
+
+    def __contains__(self, key):
+        return key in self._tables
+
+
+# Process-wide cache used by the instruments.
+tableCache = TableCache()
+
+
+class DiskTableCache(object):
+    """
+    DiskTableCache 1.0
+
+    Table samples stored on disk, one raw file of samples per key, so that
+    a table drawn once never has to be drawn again, in any process.
+
+    Files are named after a hash of the key, the sample format (pyo or
+    pyo64) and `CACHE_VERSION`, and hold nothing but the samples, in the
+    machine's byte order. Reading a table maps its file into memory and
+    copies it into a new `DataTable`; every process reading the same file
+    reads it from the same pages of the system's file cache. Files are
+    written to a temporary name, then renamed, so processes drawing the same
+    table at the same time never read a partial one.
+
+    Tables read back are `DataTable`s, whatever class drew them, and are
+    meant to be shared (read-only) through a `TableCache`.
+
+    :Args:
+
+        directory : str or None
+            Directory of the files, created if needed. None turns the cache
+            off: tables are always built.
+
+    """
+    def __init__(self, directory):
+        self._directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        """Return the file holding the samples of `key`."""
+        digest = hashlib.sha1(repr((CACHE_VERSION, SAMPLE_FORMAT, key))
+                              .encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, digest + '.' + SAMPLE_FORMAT)
+
+    def load(self, key):
+        """Return the samples of `key` as a read-only memory map, or None."""
+        if self._directory is None:
+            return None
+        try:
+            return np.memmap(self.path(key), dtype=SAMPLE_FORMAT, mode='r')
+        except (IOError, OSError, ValueError):
+            # Missing, or empty.
+            return None
+
+    def store(self, key, table):
+        """Write the samples of `table` as those of `key`."""
+        if self._directory is None:
+            return
+        samples = np.asarray(table.getBuffer())
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(samples.tobytes())
+            os.replace(tmp, self.path(key))
+        except (IOError, OSError):
+            # A read-only or full disk only costs drawing the table again.
+            pass
+
+    def restore(self, key, factory):
+        """
+        Return a table with the samples of `key`, read from disk, or built
+        by `factory` (and then stored) if they aren't there.
+
+        """
+        samples = self.load(key)
+        if samples is None:
+            self.misses += 1
+            table = factory()
+            self.store(key, table)
+            return table
+        self.hits += 1
+        table = DataTable(len(samples))
+        np.asarray(table.getBuffer())[:] = samples
+        # Writing through the buffer leaves the guard point after the last
+        # sample alone; any arithmetic on the table redraws it.
+        table.add(0)
+        return table
+
+    def clear(self):
+        """Delete every file of the cache."""
+        if self._directory is None or not os.path.isdir(self._directory):
+            return
+        for name in os.listdir(self._directory):
+            if name.endswith(('.float32', '.float64', '.tmp')):
+                os.remove(os.path.join(self._directory, name))
+
+    @property
+    def directory(self):
+        """str or None. Directory of the files."""
+        return self._directory
+
+
+# Process-wide on-disk cache behind `tableCache`.
+diskCache = DiskTableCache(os.environ.get('GROUND_STATE_TABLES', CACHE_DIR)
+                           or None)
+
+
+def waveTableKey(shape, order=50, size=24000, normalize=True):
+    """Return the cache key for a waveform table."""
+    if shape not in SHAPES:
+        raise ValueError("unknown table shape {0!r}; expected one of {1}"
+                         .format(shape, sorted(SHAPES)))
+    return ('wave', shape, int(order), int(size), bool(normalize))
+
+
+def sharedWaveTable(shape, order=50, size=24000, normalize=True, owner=None):
+    """
+    Return the shared waveform table for the given parameters.
+
+    :Args:
+
+        shape : str
+            One of 'saw', 'square' or 'tri'.
+        order : int, optional
+            Number of harmonics. Defaults to 50.
+        size : int, optional
+            Table size in samples. Defaults to 24000.
+        normalize : bool, optional
+            Normalize the table after drawing it. Defaults to True.
+        owner : object, optional
+            Release the reference when `owner` is garbage collected.
+
+    """
+    key = waveTableKey(shape, order, size, normalize)
+
+    def factory():
+        table = SHAPES[shape](order, size)
+        if normalize:
+            table.normalize()
+        return table
+
+    return tableCache.acquire(key, factory, owner, persist=True)
+
+
+def envelopeTableKey(points, interp='cos', size=8192):
+    """Return the cache key for a breakpoint envelope table."""
+    if interp not in ENVELOPES:
+        raise ValueError("unknown envelope interpolation {0!r}; expected one "
+                         "of {1}".format(interp, sorted(ENVELOPES)))
+    points = tuple((int(x), float(y)) for x, y in points)
+    return ('env', interp, points, int(size))
+
+
+def sharedEnvelopeTable(points, interp='cos', size=8192, owner=None):
+    """
+    Return the shared envelope table drawn through the given breakpoints.
+
+    Every instrument (and every `TrigEnv`) asking for the same breakpoints,
+    interpolation and size reads the same table, which must not be modified.
+
+    :Args:
+
+        points : list of tuples
+            (index, value) breakpoints, as for `CosTable`.
+        interp : str, optional
+            'cos' (`CosTable`) or 'linear' (`LinTable`). Defaults to 'cos'.
+        size : int, optional
+            Table size in samples. Defaults to 8192.
+        owner : object, optional
+            Release the reference when `owner` is garbage collected.
+
+    """
+    key = envelopeTableKey(points, interp, size)
+
+    def factory():
+        return ENVELOPES[interp](list(key[2]), size)
+
+    return tableCache.acquire(key, factory, owner)
+
+
+def whaleReport(server, voices=32):
+    """
+    Build `voices` Whale instruments, and return the table cache `report`
+    while they are running, next to the 'instances' count. Without sharing,
+    each of them would hold its own two envelope tables and wavetable.
+
+    """
+    from pyo import Metro, Sig
+    from ground_state.pyo.instruments.whale import Whale
+    # The cache the instruments use, even when this module runs as a script.
+    from ground_state.pyo.generators.tablecache import tableCache
+
+    freq = Sig(55)
+    trig = Metro(1).play()
+    whales = [Whale(freq, trig) for i in range(voices)]
+    report = tableCache.report()
+    report['instances'] = len(whales)
+    return report
+
+
+def bootTimes(directory=None):
+    """
+    Return the seconds taken to get the instruments' wavetables (saw and
+    tri, order 50, 24000 samples, and a saw `TableBank`) 'drawn', then
+    'read' back from an on-disk cache in `directory` (a new temporary
+    directory by default). Needs a booted server.
+
+    """
+    import shutil
+    import time
+    from ground_state.pyo.generators.tablebank import TableBank
+    # The caches the instruments use, even when this module runs as a script.
+    from ground_state.pyo.generators import tablecache
+
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp()
+    saved = tablecache.diskCache
+    tablecache.diskCache = DiskTableCache(directory)
+    times = {}
+    try:
+        for name in ('drawn', 'read'):
+            tablecache.tableCache.clear()
+            start = time.perf_counter()
+            tables = [tablecache.sharedWaveTable('saw'),
+                      tablecache.sharedWaveTable('tri'), TableBank('saw')]
+            times[name] = time.perf_counter() - start
+            del tables
+    finally:
+        tablecache.diskCache = saved
+        tablecache.tableCache.clear()
+        if temporary:
+            shutil.rmtree(directory)
+    return times
+
+
+# Run this script to report the memory saved by sharing 32 Whale's tables,
+# and the time saved by reading tables from disk.
+if __name__ == "__main__":
+    from pyo import Server
+
+    s = Server(audio='manual', duplex=0).boot()
+    times = bootTimes()
+    print("wavetables: {0[drawn]:.3f} s drawn, {0[read]:.3f} s read from "
+          "disk".format(times))
+    report = whaleReport(s)
+    print("{0} Whale instances".format(report.pop('instances')))
+    for kind, entry in sorted(report.items()):
+        print("{0}: {1[tables]} tables for {1[references]} references, "
+              "{2:.1f} KiB instead of {3:.1f} KiB"
+              .format(kind, entry, entry['bytes'] / 1024.0,
+                      entry['unshared'] / 1024.0))
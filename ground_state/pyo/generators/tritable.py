@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 # encoding: utf-8
 # This generator is taken verbatim from the Pyo documentation.
+import weakref
+
 from pyo import PyoTableObject, Server, Osc, HarmTable
+from ground_state.pyo.generators.tablecache import (tableCache, waveTableKey,
+                                                    sharedWaveTable)
 
 
 class TriTable(PyoTableObject):
@@ -19,6 +23,11 @@ class TriTable(PyoTableObject):
             will contain `order` odd harmonics. Defaults to 10.
         size : int, optional
             Table size in samples. Defaults to 8192.
+        shared : bool, optional
+            If True, the (normalized) waveform is taken from the process-wide
+            table cache, and is shared with every other `TriTable` of the
+            same `order` and `size`. Shared tables must not be modified.
+            Defaults to True.
 
     >>> s = Server().boot()
     >>> s.start()
@@ -26,12 +35,25 @@ class TriTable(PyoTableObject):
     >>> a = Osc(table=t, freq=[199,200], mul=.2).out()
 
     """
-    def __init__(self, order=10, size=8192):
+    def __init__(self, order=10, size=8192, shared=True):
         PyoTableObject.__init__(self, size)
         self._order = order
-        self._tri_table = HarmTable(self._create_list(order), size)
+        self._shared = shared
+        self._release = None
+        if self._shared:
+            self._acquire(order)
+        else:
+            self._tri_table = HarmTable(self._create_list(order), size)
+            self._base_objs = self._tri_table.getBaseObjects()
+            self.normalize()
+
+    def _acquire(self, order):
+        # internal method used to fetch the waveform from the table cache
+        size = self._size
+        self._tri_table = sharedWaveTable('tri', order, size)
         self._base_objs = self._tri_table.getBaseObjects()
-        self.normalize()
+        self._release = weakref.finalize(self, tableCache.release,
+                                         waveTableKey('tri', order, size))
 
     @staticmethod
     def _create_list(order):
@@ -57,8 +79,13 @@ class TriTable(PyoTableObject):
 
         """
         self._order = x
-        self._tri_table.replace(self._create_list(x))
-        self.normalize()
+        if self._shared:
+            # Never redraw a shared table; swap to the one for the new order.
+            self._release()
+            self._acquire(x)
+        else:
+            self._tri_table.replace(self._create_list(x))
+            self.normalize()
         self.refreshView()
 
     @property
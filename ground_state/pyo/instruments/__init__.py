@@ -1,2 +1,3 @@
 # from aqueous import Aqueous
 # from whale import Whale
+# from poly import Poly
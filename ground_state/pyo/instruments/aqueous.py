@@ -9,7 +9,12 @@
 # the Free Software Foundation, either version 3 of the License, or
 # (at your option) any later version <http://www.gnu.org/licenses/>.
 
-from pyo import PyoObject, Adsr, ButBP, EQ, Mix, Osc, SawTable
+from pyo import PyoObject, ButBP, EQ, Osc, TrigFunc
+from pyo import convertArgsToLists
+from ground_state.pyo.generators.envelopes import MultiAdsr
+from ground_state.pyo.generators.tablecache import sharedWaveTable
+from ground_state.pyo.utils.gainfold import GainFolder
+from ground_state.pyo.utils.idle import IdleGate
 
 
 class Aqueous(PyoObject):
@@ -26,86 +31,150 @@ class Aqueous(PyoObject):
             |                      |
     saw2 -> reson2 -> resonEnv --->|
 
-    We have four independent envelopes (reson1Env, reson2Env, amp1Env,
-    amp2Env) with slightly different sustain levels/timing. The envelopes are
-    the most complex aspect of this instrument. I don't entirely understand
-    what goes on here (design by tweak).
+    We have three envelopes (reson1Env, reson2Env, ampEnv) with slightly
+    different sustain levels/timing, computed together by one `MultiAdsr`.
+    The envelopes are the most complex aspect of this instrument. I don't
+    entirely understand what goes on here (design by tweak).
+
+    Lists (or multi-stream objects) as `freq` or `mul` expand into as many
+    voices, one audio stream each, played together by `play`. The voices
+    share the saw table and the envelopes; a list as `dur` gives the
+    envelopes one stream per duration instead.
 
     :Parent: :py:class:`PyoObject`
 
     :Args:
 
-        freq : PyoObject
+        freq : float, PyoObject or list
             Frequency to generate.
-        dur : float
+        dur : float or list
             Time in seconds for the instrument to play once triggered.
+        idle : bool, optional
+            Stop the oscillators and filters between notes, once the
+            envelopes have finished. Defaults to True.
 
     """
-    def __init__(self, freq=1000, dur=1, mul=1, add=0):
+    def __init__(self, freq=1000, dur=1, mul=1, add=0, idle=True):
         PyoObject.__init__(self, mul, add)
         self._freq = freq
         self._dur = dur
         self._mul = mul
         self._add = add
+        self._idle = idle
+
+        freq, dur, mul, add, lmax = convertArgsToLists(freq, dur, mul, add)
+        self._voices = lmax
+        self._envelopes = len(dur)
 
         # Begin processing.
 
+        # Amplitude knobs. Rather than each being a `x * 1.0` object of its
+        # own, they are folded into the `mul` of objects we need anyway;
+        # `setGain` keeps them tweakable.
+        self._gains = GainFolder()
+        # Split Saw 1 into two paths with independent amplitudes.
+        self._gains.gain('saw1ToReson1', 0.63)
+        self._gains.gain('saw1ToReson2', 0.38)
+        # Allow mixing Saw 2 with Saw1, going into Reson2.
+        self._gains.gain('saw2ToReson2', 0.38)
+        # Filter levels.
+        self._gains.gain('reson1Level', 0.7079)
+        self._gains.gain('reson2Level', 0.7079)
+        # Lets us more easily balance the filter levels.
+        self._gains.gain('reson1Out', 0.3)
+        self._gains.gain('reson2Out', 0.4842)
+
+        # Both Saw oscillators read the same table, shared with every other
+        # Aqueous.
+        self._sawTable = sharedWaveTable('saw', order=50, size=24000,
+                                         owner=self)
+
         # 1st Saw oscillator.
-        saw1Table = SawTable(order=50, size=24000).normalize()
-        self._saw1 = Osc(saw1Table, self._freq, interp=4, mul=0.6839)
-        # Dummy amplitude knobs to split Saw 1 into two paths with independent
-        # amplitudes.
-        # Out to Reson1.
-        saw1Dummy1 = self._saw1 * 1.0
-        saw1Dummy1.setMul(0.63)
-        # Out to Reson2.
-        saw1Dummy2 = self._saw1 * 1.0
-        saw1Dummy2.setMul(0.38)
-
-        # 1st Resonant filter.
-        # total duration =  note value + 1954ms
-        # sustain at 95%
-        self._reson1Env = Adsr(1.280, 0.097, 0.95, 0.577, dur=self._dur)
-        reson1 = EQ(saw1Dummy1, freq=self._freq, q=100, boost=3.0, type=1,
-                    mul=self._reson1Env * 0.7079)
-        # Dummy amplitude knob; lets us more easily balance the filter levels.
-        reson1Dummy = reson1 * 1.0
+        self._saw1 = Osc(self._sawTable, self._freq, interp=4, mul=0.6839)
+
+        # Every envelope, as one object:
+        # reson1Env, total duration =  note value + 1954ms, sustain at 95%
+        # reson2Env, total duration =  note value + 1954ms, sustain at 53%
+        # ampEnv, total duration =  note value + 1862ms, sustain at %100
+        # The two filters used to have amplitude envelopes of their own, but
+        # with a 100% sustain, the decay makes no difference: they were the
+        # same envelope at two different levels, and those levels are
+        # folded into the filter envelopes instead.
+        self._envs = MultiAdsr([1.280, 1.280, 0.577], 0.097,
+                               [0.95, 0.53, 1.0], [0.577, 0.577, 1.280],
+                               dur=self._dur)
+        self._reson1Env = self._envs.output(0)
+        self._reson2Env = self._envs.output(1)
+        self._ampEnv = self._envs.output(2)
+
+        # 1st Resonant filter. The EQ is linear, so the Saw 1 send level is
+        # applied on its output, through the envelope's `mul`.
+        self._gains.fold(self._reson1Env,
+                         ['reson1Level', 'saw1ToReson1', 'reson1Out'])
+        self._reson1 = EQ(self._saw1, freq=self._freq, q=100, boost=3.0,
+                          type=1, mul=self._reson1Env)
 
         # 2nd Saw oscillator.
-        saw2Table = SawTable(order=50, size=24000).normalize()
-        self._saw2 = Osc(saw2Table, self._freq / 2, interp=4, mul=0.5433)
-        # Dummy amplitude knob to allow mixing with Saw1, going into Reson2.
-        saw2Dummy = self._saw2 * 1.0
-        saw2Dummy.setMul(0.38)
+        self._saw2 = Osc(self._sawTable, self._saw2Freq(self._freq),
+                         interp=4)
+        self._gains.fold(self._saw2, ['saw2ToReson2'], scale=0.5433)
+        # saw1 * saw1ToReson2 + saw2, as a single object.
+        reson2Input = self._saw1 * 1.0
+        self._gains.fold(reson2Input, ['saw1ToReson2'])
+        reson2Input.setAdd(self._saw2)
 
         # 2nd Resonant filter.
-        # total duration =  note value + 1954ms
-        # sustain at 53%
-        self._reson2Env = Adsr(1.280, 0.097, 0.53, 0.577, dur=self._dur)
-        reson2 = EQ(saw1Dummy2 + saw2Dummy, freq=self._freq + 1300, q=100,
-                    boost=3.0, type=1, mul=self._reson2Env * 0.7079)
-        # Dummy amplitude knob; lets us more easily balance the filter levels.
-        reson2Dummy = reson2 * 1.0
-
-        # Amplitude envelopes for the filters.
-        # total duration =  note value + 1954ms
-        # sustain at %100
-        self._amp1Env = Adsr(0.577, 0.097, 1.0, 1.280, dur=self._dur)
-        # total duration =  note value + 1862ms
-        # sustain at %100
-        self._amp2Env = Adsr(0.577, 0.005, 1.0, 1.280, dur=self._dur)
-
-        # Tweak filter levels
-        reson1Dummy.setMul(self._amp1Env * 0.3)
-        reson2Dummy.setMul(self._amp2Env * 0.4842)
-        filtersDummy = reson1Dummy + reson2Dummy
-        bpf = ButBP(filtersDummy, freq=325, q=1)
-
-        # Volume knob
-        aqueous = Mix(bpf, mul=self._mul)
+        self._gains.fold(self._reson2Env, ['reson2Level', 'reson2Out'])
+        self._reson2 = EQ(reson2Input, freq=self._reson2Freq(self._freq),
+                          q=100, boost=3.0, type=1, mul=self._reson2Env)
+
+        # (reson1 + reson2) * ampEnv. Objects are processed in creation
+        # order, so reson2's path must exist before the sum.
+        reson2Out = self._reson2 * self._ampEnv
+        filters = self._reson1 * 1.0
+        filters.setMul(self._ampEnv)
+        filters.setAdd(reson2Out)
+        self._gains.absorb(filters, ['ampEnv'])
+
+        # Volume knob, on the (mono) filter itself.
+        aqueous = ButBP(filters, freq=325, q=1, mul=self._mul)
+        self._gains.absorb(aqueous, ['mul'])
 
         self._base_objs = aqueous.getBaseObjects()
 
+        # Every envelope ends after `dur`, at 0; from then on, the chain is
+        # silent until the next `play`.
+        self._gate = IdleGate([self._saw1, self._reson1, self._saw2,
+                               reson2Input, self._reson2, reson2Out,
+                               filters, aqueous], voices=lmax)
+        self._sleepFunc = None
+        if self._idle:
+            self._sleepFunc = TrigFunc(self._ampEnv['trig'], self._sleep,
+                                       arg=list(range(self._envelopes)))
+            # Silent until the first note.
+            self._gate.sleep()
+
+    def _saw2Freq(self, x):
+        # internal method returning Saw 2's frequency for `x`, per voice
+        if isinstance(x, list):
+            return [f / 2 for f in x]
+        return x / 2
+
+    def _reson2Freq(self, x):
+        # internal method returning Reson 2's frequency for `x`, per voice
+        if isinstance(x, list):
+            return [f + 1300 for f in x]
+        return x + 1300
+
+    def _sleep(self, envelope):
+        # internal method called when the envelopes of stream `envelope`
+        # have finished, i.e. those of every voice it drives
+        if self._envelopes == 1:
+            self._gate.sleep()
+            return
+        for voice in range(envelope, self._voices, self._envelopes):
+            self._gate.sleep(voice)
+
     def setFreq(self, x):
         """
         Replace the `freq` attribute.
@@ -118,7 +187,47 @@ class Aqueous(PyoObject):
         """
         self._freq = x
         self._saw1.freq = x
-        self._saw2.freq = x
+        self._reson1.freq = x
+        self._saw2.freq = self._saw2Freq(x)
+        self._reson2.freq = self._reson2Freq(x)
+
+    def setDur(self, x):
+        """
+        Replace the `dur` attribute.
+
+        :Args:
+
+            x : float
+                New `dur` attribute.
+
+        """
+        self._dur = x
+        self._envs.dur = x
+
+    def setGain(self, name, x):
+        """
+        Change one of the internal amplitude knobs.
+
+        :Args:
+
+            name : str
+                One of 'saw1ToReson1', 'saw1ToReson2', 'saw2ToReson2',
+                'reson1Level', 'reson2Level', 'reson1Out' or 'reson2Out'.
+            x : float
+                New gain.
+
+        """
+        self._gains.setGain(name, x)
+
+    @property
+    def gains(self):
+        """dict. Current value of every internal amplitude knob."""
+        return self._gains.gains()
+
+    @property
+    def folds(self):
+        """list. (stages, nodes saved) of every gain folded into a `mul`."""
+        return self._gains.folded()
 
     @property
     def freq(self):
@@ -129,28 +238,40 @@ class Aqueous(PyoObject):
     def freq(self, x):
         self.setFreq(x)
 
+    @property
+    def dur(self):
+        """float. Duration in seconds."""
+        return self._dur
+
+    @dur.setter
+    def dur(self, x):
+        self.setDur(x)
+
+    @property
+    def voices(self):
+        """int. Number of voices (audio streams)."""
+        return self._voices
+
+    @property
+    def skipped(self):
+        """int. Node-blocks skipped while idle (streams x blocks)."""
+        return self._gate.skipped
+
     def __dir__(self):
-        return ["freq", "mul", "add"]
+        return ["freq", "dur", "mul", "add"]
 
     def play(self, dur=0, delay=0):
-        self._reson1Env.play(dur, delay)
-        self._reson2Env.play(dur, delay)
-        self._amp1Env.play(dur, delay)
-        self._amp2Env.play(dur, delay)
+        self._gate.wake()
+        self._envs.play(dur, delay)
         return PyoObject.play(self, dur, delay)
 
     def stop(self):
-        self._reson1Env.stop()
-        self._reson2Env.stop()
-        self._amp1Env.stop()
-        self._amp2Env.stop()
+        self._envs.stop()
         return PyoObject.stop(self)
 
     def out(self, chnl=0, inc=1, dur=0, delay=0):
-        self._reson1Env.play(dur, delay)
-        self._reson2Env.play(dur, delay)
-        self._amp1Env.play(dur, delay)
-        self._amp2Env.play(dur, delay)
+        self._gate.wake()
+        self._envs.play(dur, delay)
         return PyoObject.out(self, chnl, inc, dur, delay)
 
 # Run this script to test the Aqueous class.
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+# This is a voice manager for pyo <http://code.google.com/p/pyo> "instruments".
+# Latest version always available at <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+import inspect
+
+from pyo import PyoObject, Follower, Mix, Sig, Trig
+
+
+class Poly(PyoObject):
+    """
+    Poly 1.0
+
+    Polyphonic voice manager.
+
+    Preallocates `voices` instances of an instrument class and hands every
+    incoming note to a free one, so a new note doesn't cut off the release of
+    the previous one. When every voice is busy, one is stolen: either the one
+    which started first ('oldest') or the one with the lowest current
+    amplitude ('quietest'). Since all the voices exist up front, CPU cost is
+    fixed, whatever the note density.
+
+    Each voice gets its own `Sig` as `freq`. Instruments taking a `trig`
+    argument (e.g. Whale) also get their own `Trig`, which is fired on note-on;
+    the others (e.g. Aqueous) are retriggered through their `play` method.
+
+    Signal chain:
+    voice 1 ---|
+    voice 2 ---|--> mix -> out
+    voice N ---|
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        instrument : class
+            Instrument class to instantiate for each voice.
+        voices : int, optional
+            Number of preallocated voices. Defaults to 8.
+        steal : str, optional
+            Voice stealing policy, 'oldest' or 'quietest'. Defaults to
+            'oldest'.
+        release : float, optional
+            Time in seconds a voice keeps sounding past its `dur` (release
+            tail), during which it is still considered busy. Defaults to 2.
+        **kwargs
+            Any other keyword argument is passed to the instrument class.
+
+    >>> s = Server().boot()
+    >>> s.start()
+    >>> p = Poly(Aqueous, voices=4, dur=2, mul=0.25).out()
+    >>> p.noteOn(midiToHz(60))
+
+    """
+    def __init__(self, instrument, voices=8, steal='oldest', release=2.0,
+                 mul=1, add=0, **kwargs):
+        PyoObject.__init__(self, mul, add)
+        self._instrument = instrument
+        self._release = release
+        self._mul = mul
+        self._add = add
+
+        takesTrig = 'trig' in inspect.signature(instrument).parameters
+        initFreq = kwargs.pop('freq', 1000)
+
+        self._freqs = []
+        self._trigs = []
+        self._voices = []
+        for i in range(voices):
+            freq = Sig(initFreq)
+            self._freqs.append(freq)
+            if takesTrig:
+                # A `Trig` fires as soon as it is made; it must only fire
+                # from `noteOn`.
+                trig = Trig().stop()
+                self._trigs.append(trig)
+                voice = instrument(freq=freq, trig=trig, **kwargs)
+            else:
+                voice = instrument(freq=freq, **kwargs)
+            self._voices.append(voice)
+
+        # Bookkeeping, in samples since the server was started.
+        self._starts = [None] * voices
+        self._busyUntil = [0] * voices
+        self._notes = 0
+        self._stolen = 0
+
+        # Amplitude followers are only built when stealing the quietest voice.
+        self._followers = None
+        self.setSteal(steal)
+
+        poly = Mix(self._voices, voices=len(self._voices[0]), mul=self._mul,
+                   add=self._add)
+        self._base_objs = poly.getBaseObjects()
+
+    def _now(self):
+        # internal method returning the current server time in samples
+        return self.getServer().getCurrentTimeInSamples()
+
+    def _pickVoice(self, now):
+        # internal method choosing the voice for the next note
+        free = [i for i, t in enumerate(self._busyUntil) if t <= now]
+        if free:
+            # Least recently started free voice, so release tails get the
+            # longest possible time to ring out.
+            return min(free, key=lambda i: (self._starts[i] is not None,
+                                            self._starts[i])), False
+        if self._steal == 'quietest':
+            amps = [f.get() for f in self._followers]
+            return amps.index(min(amps)), True
+        return self._starts.index(min(self._starts)), True
+
+    def noteOn(self, freq, dur=None):
+        """
+        Play a note on a free (or stolen) voice, and return its index.
+        While the Poly is stopped, nothing is played, and None is returned.
+
+        :Args:
+
+            freq : float
+                Frequency of the note.
+            dur : float, optional
+                Time in seconds for the voice to play. If not given, the
+                voice's current `dur` is used.
+
+        """
+        if not self.isPlaying():
+            return None
+        now = self._now()
+        i, stolen = self._pickVoice(now)
+        voice = self._voices[i]
+        self._freqs[i].value = freq
+        if dur is not None:
+            voice.dur = dur
+        if self._trigs:
+            self._trigs[i].play()
+        else:
+            voice.play()
+        sr = self.getSamplingRate()
+        self._starts[i] = now
+        self._busyUntil[i] = now + int((voice.dur + self._release) * sr)
+        self._notes += 1
+        if stolen:
+            self._stolen += 1
+        return i
+
+    def activeVoices(self):
+        """Return the number of voices currently busy."""
+        now = self._now()
+        return len([t for t in self._busyUntil if t > now])
+
+    def usage(self):
+        """
+        Return a dict reporting voice usage.
+
+        Keys are 'voices' (allocated), 'active' (busy right now), 'notes'
+        (played so far) and 'stolen' (notes which had to steal a voice).
+
+        """
+        return {'voices': len(self._voices),
+                'active': self.activeVoices(),
+                'notes': self._notes,
+                'stolen': self._stolen}
+
+    def getVoices(self):
+        """Return the list of instrument instances."""
+        return self._voices
+
+    def setSteal(self, x):
+        """
+        Replace the `steal` attribute.
+
+        :Args:
+
+            x : str
+                New `steal` attribute, 'oldest' or 'quietest'.
+
+        """
+        if x not in ('oldest', 'quietest'):
+            raise ValueError("steal must be 'oldest' or 'quietest', not {0!r}"
+                             .format(x))
+        self._steal = x
+        if x == 'quietest' and self._followers is None:
+            self._followers = [Follower(v, freq=20) for v in self._voices]
+
+    def setRelease(self, x):
+        """
+        Replace the `release` attribute.
+
+        :Args:
+
+            x : float
+                New `release` attribute.
+
+        """
+        self._release = x
+
+    def _playVoices(self, dur, delay):
+        # internal method restarting what `stop` stopped. Voices taking a
+        # trigger run all along; the others are played by `noteOn`.
+        if self._trigs:
+            for voice in self._voices:
+                voice.play(dur, delay)
+        if self._followers is not None:
+            for follower in self._followers:
+                follower.play(dur, delay)
+
+    def play(self, dur=0, delay=0):
+        self._playVoices(dur, delay)
+        return PyoObject.play(self, dur, delay)
+
+    def out(self, chnl=0, inc=1, dur=0, delay=0):
+        self._playVoices(dur, delay)
+        return PyoObject.out(self, chnl, inc, dur, delay)
+
+    def stop(self):
+        for voice in self._voices:
+            voice.stop()
+        if self._followers is not None:
+            for follower in self._followers:
+                follower.stop()
+        self._busyUntil = [0] * len(self._voices)
+        return PyoObject.stop(self)
+
+    @property
+    def steal(self):
+        """str. Voice stealing policy."""
+        return self._steal
+
+    @steal.setter
+    def steal(self, x):
+        self.setSteal(x)
+
+    @property
+    def release(self):
+        """float. Release tail of a voice, in seconds."""
+        return self._release
+
+    @release.setter
+    def release(self, x):
+        self.setRelease(x)
+
+    def __dir__(self):
+        return ["steal", "release", "mul", "add"]
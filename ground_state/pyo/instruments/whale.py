@@ -9,9 +9,21 @@
 # the Free Software Foundation, either version 3 of the License, or
 # (at your option) any later version <http://www.gnu.org/licenses/>.
 
-from pyo import PyoObject, CosTable, EQ, Osc
-from pyo import Sine, TrigEnv, convertArgsToLists
+from pyo import PyoObject, EQ, Osc
+from pyo import Sine, TrigEnv, TrigFunc, convertArgsToLists
+from pyo.lib._core import wrap
+from ground_state.pyo.generators.tablecache import sharedEnvelopeTable
 from ground_state.pyo.generators.tritable import TriTable
+from ground_state.pyo.utils.gainfold import GainFolder
+from ground_state.pyo.utils.idle import IdleGate
+
+# Envelope breakpoints, for 8192-sample `CosTable`s.
+# This one drives the LFO which creates the vibrato effect. Its volume stays
+# very low until just before it ends.
+LFO_ENVELOPE = [(0, 0.0), (2457, 0.0), (6481, 0.3), (7350, 0.0), (8191, 0.0)]
+# Triangle oscillator amplitude.
+TRI_ENVELOPE = [(0, 0.0), (1535, 1.0), (2046, 0.95), (6143, 0.95),
+                (8191, 0.0)]
 
 
 class Whale(PyoObject):
@@ -25,50 +37,106 @@ class Whale(PyoObject):
     delayed-onset vibrato. It is meant to be used at low tempos, to allow
     the vibrato to fade in slowly.
 
+    Like pyo's own objects, lists (or multi-stream objects) as `freq`,
+    `trig`, `dur` or `mul` expand into as many voices, one audio stream
+    each. The voices (and every other Whale) share the wavetable and the
+    envelope tables; only the per-sample objects (envelope readers,
+    oscillators, filter) are multiplied.
+
     :Parent: :py:class:`PyoObject`
 
     :Args:
 
-        freq : PyoObject
+        freq : float, PyoObject or list
             Frequency to generate.
-        trig : PyoObject
+        trig : PyoObject or list
             A trigger to drive note-ons.
-        dur : float
+        dur : float or list
             Time in seconds for the instrument to play once triggered.
+        idle : bool, optional
+            Stop the oscillators and filter between notes, once the
+            envelopes have finished. Defaults to True.
 
     """
-    def __init__(self, freq=1000, trig=PyoObject, dur=3.78, mul=1):
+    def __init__(self, freq=1000, trig=PyoObject, dur=3.78, mul=1,
+                 idle=True):
         PyoObject.__init__(self, mul)
         self._freq = freq
         self._trig = trig
         self._dur = dur
         self._mul = mul
+        self._idle = idle
 
         freq, trig, dur, mul, lmax = convertArgsToLists(freq, trig, dur, mul)
-
-        # LFO signal chain.
-        # This envelope drives the LFO which creates the vibrato effect. Its
-        # volume stays very low until just before it ends.
-        lfoEnvTable = CosTable([(0, 0.0), (2457, 0.0), (6481, 0.3),
-                                (7350, 0.0), (8191, 0.0)])
+        self._voices = lmax
+        # One trigger stream per voice, so that every voice has its own
+        # envelopes (and can go idle on its own).
+        triggered = isinstance(self._trig, (PyoObject, list))
+        trigs = self._trig
+        if triggered:
+            trigs = [wrap(trig, i) for i in range(lmax)]
+
+        # LFO signal chain. Both envelope tables are shared with every other
+        # Whale.
+        lfoEnvTable = sharedEnvelopeTable(LFO_ENVELOPE, owner=self)
         # lfoEnvTable.graph()
-        self._lfoEnv = TrigEnv(self._trig, lfoEnvTable, dur=self._dur)
-        self._lfo = Sine(4.27, mul=self._lfoEnv)
+        self._lfoEnv = TrigEnv(trigs, lfoEnvTable, dur=self._dur)
 
         # Triangle oscillator signal chain.
-        triEnvTable = CosTable([(0, 0.0), (1535, 1.0), (2046, 0.95),
-                                (6143, 0.95), (8191, 0.0)])
+        triEnvTable = sharedEnvelopeTable(TRI_ENVELOPE, owner=self)
         # triEnvTable.graph()
-        self._triEnv = TrigEnv(self._trig, triEnvTable, dur=self._dur)
+        self._triEnv = TrigEnv(trigs, triEnvTable, dur=self._dur)
 
-        # TriTable Table oscillator from the pyo docs.
-        triTable = TriTable(order=50, size=24000).normalize()
+        # Wakes the idle chain up. Objects are processed in creation order,
+        # so this must exist before the chain for the note to start within
+        # the trigger's block.
+        self._wakeFunc = None
+        if self._idle and triggered:
+            self._wakeFunc = TrigFunc(trigs, self._wake,
+                                      arg=list(range(lmax)))
 
-        self._osc = Osc(triTable, self._freq, interp=4,
-                        mul=((self._triEnv + self._lfo) * self._mul))
-        self._whale = EQ(self._osc, freq=self._freq * 16, q=1, type=1)
+        self._lfo = Sine(4.27, mul=self._lfoEnv)
+
+        # TriTable Table oscillator from the pyo docs. The (normalized) table
+        # is shared with every other Whale.
+        self._triTable = TriTable(order=50, size=24000)
+
+        self._oscEnv = self._triEnv + self._lfo
+        self._osc = Osc(self._triTable, self._freq, interp=4,
+                        mul=self._oscEnv)
+        # The EQ is linear, so the volume knob goes on its `mul` rather than
+        # on an extra object scaling the oscillator's envelope.
+        self._whale = EQ(self._osc, freq=self._eqFreq(self._freq), q=1,
+                         type=1, mul=self._mul)
+        self._gains = GainFolder()
+        self._gains.absorb(self._whale, ['mul'])
         self._base_objs = self._whale.getBaseObjects()
 
+        # Both envelopes end together, and at 0; from then on, the voice is
+        # silent until its next trigger.
+        self._gate = IdleGate([self._lfo, self._oscEnv, self._osc,
+                               self._whale], voices=lmax)
+        self._sleepFunc = None
+        if self._wakeFunc is not None:
+            self._sleepFunc = TrigFunc(self._triEnv['trig'], self._sleep,
+                                       arg=list(range(lmax)))
+            # Silent until the first trigger.
+            self._gate.sleep()
+
+    def _eqFreq(self, x):
+        # internal method returning the filter frequency for `x`, per voice
+        if isinstance(x, list):
+            return [f * 16 for f in x]
+        return x * 16
+
+    def _wake(self, voice):
+        # internal method called on every trigger of `voice`
+        self._gate.wake(voice)
+
+    def _sleep(self, voice):
+        # internal method called when the envelopes of `voice` have finished
+        self._gate.sleep(voice)
+
     def setFreq(self, x):
         """
         Replace the `freq` attribute.
@@ -80,6 +148,8 @@ class Whale(PyoObject):
 
         """
         self._freq = x
+        self._osc.freq = x
+        self._whale.freq = self._eqFreq(x)
 
     def setTrig(self, x):
         """
@@ -92,8 +162,13 @@ class Whale(PyoObject):
 
         """
         self._trig = x
-        self._lfoEnv.trig = x
-        self._triEnv.trig = x
+        trig, lmax = convertArgsToLists(x)
+        # Keep one trigger stream per voice.
+        trigs = [wrap(trig, i) for i in range(self._voices)]
+        self._lfoEnv.input = trigs
+        self._triEnv.input = trigs
+        if self._wakeFunc is not None:
+            self._wakeFunc.input = trigs
 
     def setDur(self, x):
         """
@@ -136,7 +211,26 @@ class Whale(PyoObject):
     def dur(self, x):
         self.setDur(x)
 
+    @property
+    def voices(self):
+        """int. Number of voices (audio streams)."""
+        return self._voices
+
+    @property
+    def folds(self):
+        """list. (stages, nodes saved) of every gain folded into a `mul`."""
+        return self._gains.folded()
+
+    @property
+    def skipped(self):
+        """int. Node-blocks skipped while idle (streams x blocks)."""
+        return self._gate.skipped
+
     def play(self, dur=0, delay=0):
+        self._gate.wake()
+        if self._wakeFunc is not None:
+            self._wakeFunc.play()
+            self._sleepFunc.play()
         self._lfoEnv.play(dur, delay)
         self._lfo.play(dur, delay)
         self._triEnv.play(dur, delay)
@@ -144,6 +238,10 @@ class Whale(PyoObject):
         return PyoObject.play(self, dur, delay)
 
     def stop(self):
+        # Keep the triggers from waking the chain up again.
+        if self._wakeFunc is not None:
+            self._wakeFunc.stop()
+            self._sleepFunc.stop()
         self._lfoEnv.stop()
         self._lfo.stop()
         self._triEnv.stop()
@@ -151,10 +249,15 @@ class Whale(PyoObject):
         return PyoObject.stop(self)
 
     def out(self, chnl=0, inc=1, dur=0, delay=0):
-        self._lfoEnv.out(dur, delay)
-        self._lfo.out(dur, delay)
-        self._triEnv.out(dur, delay)
-        self._osc.out(dur, delay)
+        # As `play`; only the Whale itself goes to the outputs.
+        self._gate.wake()
+        if self._wakeFunc is not None:
+            self._wakeFunc.play()
+            self._sleepFunc.play()
+        self._lfoEnv.play(dur, delay)
+        self._lfo.play(dur, delay)
+        self._triEnv.play(dur, delay)
+        self._osc.play(dur, delay)
         return PyoObject.out(self, chnl, inc, dur, delay)
 
 # Run this script to test the Whale class.
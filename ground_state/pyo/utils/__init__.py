@@ -1,3 +1,20 @@
+# from automation import Automation, Curve, graphCurves
+# from benchmark import compare
+# from calibrate import calibrate, loadProfile
+# from clock import Clock
 # from dbToAmp import dbToAmp
+# from driver import BlockDriver, driveSong
+# from encode import EncoderPipeline
+# from events import EventLane, EventScheduler
+# from footprint import footprint, serverFootprint
+# from gain import ampToDb, dbToAmp, DbSig
+# from gainfold import GainFolder
+# from idle import IdleGate
+# from loudness import LevelMeter
+# from presets import PresetStore, savePresets
+# from render import renderSong, streamSong, RenderServer
 # from serverSetup import serverSetup
+# from sweep import sweep, grid, randomSample
 # from tempo import Tempo
+# from trace import Tracer
+# from tuning import Scale, Tune
@@ -0,0 +1,268 @@
+# encoding: utf-8
+
+# This is a breakpoint automation engine for pyo
+# <http://code.google.com/p/pyo>, which plays Cecilia5 graph curves as audio
+# rate signals. Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Play breakpoint curves (Cecilia's `userGraph`s) as audio rate controls.
+Use it thusly:
+    'curves = graphCurves(preset, PULSAR_RANGES)'
+    'width = Automation(curves['width'])'
+    'sched = EventScheduler(s)'
+    'sched.automate(width)'
+or, for offline renders, with the whole curve computed up front:
+    'width = Automation(curves['width'], size=None)'.
+
+A curve is evaluated a whole block of samples at a time: every sample's
+segment is found by binary search over the breakpoints, and the segments
+are interpolated with array arithmetic, so a curve of hundreds of points
+costs about as much per block as a two-point one. The values are written
+ahead of time into a table, which the audio side reads one sample per
+sample, like an `EventLane`; no Python runs on the audio thread.
+"""
+import math
+
+import numpy as np
+
+from pyo import PyoObject, DataTable, TableRead
+
+# Cecilia slider ranges of the Pulsar module's graph parameters, as
+# (min, max, rel).
+PULSAR_RANGES = {'bfreq': (0.1, 1000, 'log'),
+                 'width': (0.01, 1, 'lin'),
+                 'detune': (0.0001, 0.999, 'log'),
+                 'detunesp': (0.0001, 100, 'log'),
+                 'env': (0, 1, 'lin')}
+
+
+class Curve(object):
+    """
+    Curve 1.0
+
+    A breakpoint curve over `dur` seconds, as drawn in a Cecilia graph: x
+    and y from 0 to 1, y scaled to the parameter's range, linearly or
+    logarithmically. Before the first point and after the last one, the
+    curve holds its value.
+
+    :Args:
+
+        points : list or array
+            [x, y] breakpoints, in increasing x.
+        dur : float, optional
+            Duration of the whole curve in seconds. Defaults to 1.
+        minimum, maximum : float, optional
+            Parameter range. Default to 0 and 1.
+        rel : str, optional
+            'lin' or 'log' scaling of the range. Defaults to 'lin'.
+        curved : bool, optional
+            Cosine instead of linear interpolation between points. Defaults
+            to False.
+
+    """
+    def __init__(self, points, dur=1.0, minimum=0.0, maximum=1.0, rel='lin',
+                 curved=False):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            raise ValueError("a curve needs at least one point")
+        if rel not in ('lin', 'log'):
+            raise ValueError("rel must be 'lin' or 'log', not {0!r}"
+                             .format(rel))
+        self._x = points[:, 0] * dur
+        self._y = points[:, 1]
+        # Per-segment slopes; vertical jumps have none.
+        dx = np.diff(self._x)
+        dy = np.diff(self._y)
+        self._slope = np.divide(dy, dx, out=np.zeros_like(dy), where=dx > 0)
+        self._dur = dur
+        self._min = minimum
+        self._max = maximum
+        self._rel = rel
+        self._curved = curved
+
+    def _scale(self, y):
+        # internal method mapping normalized values to the parameter range
+        if self._rel == 'log':
+            return self._min * (self._max / self._min) ** y
+        return self._min + y * (self._max - self._min)
+
+    def evaluate(self, times):
+        """Return the curve's values at `times` (seconds, an array)."""
+        times = np.asarray(times, dtype=np.float64)
+        if len(self._x) == 1:
+            return self._scale(np.full(times.shape, self._y[0]))
+        t = np.clip(times, self._x[0], self._x[-1])
+        # Segment of every time: binary search over the breakpoints.
+        seg = np.searchsorted(self._x, t, side='right') - 1
+        np.clip(seg, 0, len(self._x) - 2, out=seg)
+        offset = t - self._x[seg]
+        if self._curved:
+            span = self._x[seg + 1] - self._x[seg]
+            frac = np.divide(offset, span, out=np.zeros_like(offset),
+                             where=span > 0)
+            frac = 0.5 - 0.5 * np.cos(math.pi * frac)
+            y = self._y[seg] + frac * (self._y[seg + 1] - self._y[seg])
+        else:
+            y = self._y[seg] + offset * self._slope[seg]
+        return self._scale(y)
+
+    def block(self, start, n, sr):
+        """Return `n` values, from sample `start` on, at the rate `sr`."""
+        return self.evaluate((start + np.arange(n)) / float(sr))
+
+    @property
+    def dur(self):
+        """float. Duration in seconds."""
+        return self._dur
+
+    @property
+    def points(self):
+        """int. Number of breakpoints."""
+        return len(self._x)
+
+
+def graphCurves(preset, ranges, dur=None):
+    """
+    Return a dict of `Curve`s, one per `userGraph` curve of a Cecilia
+    `preset` which `ranges` (name: (min, max, rel)) knows about. `dur`
+    defaults to the preset's 'totalTime'.
+
+    """
+    if dur is None:
+        dur = preset.get('totalTime', 1.0)
+    curves = {}
+    for name, graph in preset.get('userGraph', {}).items():
+        if name not in ranges:
+            continue
+        minimum, maximum, rel = ranges[name]
+        curves[name] = Curve(graph['data'], dur, minimum, maximum, rel,
+                             graph.get('curved', False))
+    return curves
+
+
+class Automation(PyoObject):
+    """
+    Audio rate signal playing a `Curve`, from the time it is created.
+
+    With a `size`, values are written block by block into a table of `size`
+    samples read in a loop, by `fill` (an `EventScheduler` calls it when
+    given the automation through `automate`). Without one, the whole curve
+    is written up front and read once, holding its last value; meant for
+    offline renders.
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        curve : Curve
+            Curve to play.
+        size : int or None, optional
+            Length of the table, in samples; values can't be written further
+            ahead than this. Must be a power of 2. None writes the whole
+            curve at once. Defaults to 65536.
+
+    """
+    def __init__(self, curve, size=65536, mul=1, add=0):
+        PyoObject.__init__(self, mul, add)
+        self._curve = curve
+        self._mul = mul
+        self._add = add
+
+        self._rendered = size is None
+        if self._rendered:
+            # The table's size depends on the sampling rate, which pyo only
+            # tells through an object.
+            server = DataTable(1).getServer()
+            length = int(math.ceil(curve.dur * server.getSamplingRate())) + 1
+            size = 1 << (length - 1).bit_length()
+        elif size & (size - 1):
+            raise ValueError("size must be a power of 2, not {0}"
+                             .format(size))
+        self._size = size
+        self._table = DataTable(size)
+        self._server = self._table.getServer()
+        self._sr = self._server.getSamplingRate()
+        # Written in place: the table's samples, seen as an array.
+        self._buffer = np.asarray(self._table.getBuffer())
+        # The reader starts with the next block, at the current time.
+        self._origin = self._server.getCurrentTimeInSamples()
+        self._written = self._origin
+        if self._rendered:
+            self._buffer[:] = curve.block(0, size, self._sr)
+            self._written += size
+        else:
+            self.fill(self._origin + size // 2)
+        self._reader = TableRead(self._table, freq=self._table.getRate(),
+                                 loop=int(not self._rendered), interp=1,
+                                 mul=self._mul, add=self._add)
+        if self._rendered:
+            self._reader.setKeepLast(True)
+        self._reader.play()
+        self._base_objs = self._reader.getBaseObjects()
+
+    def fill(self, sample):
+        """
+        Write the values of every sample up to the server time `sample`
+        (excluded) not written yet. Returns the number of samples written.
+
+        """
+        if self._rendered:
+            return 0
+        now = self._server.getCurrentTimeInSamples()
+        # Samples already played are gone; if the writer fell behind, pick
+        # up from the current time.
+        self._written = max(self._written, now)
+        # Never overwrite samples which haven't been read, keeping a block
+        # of margin, in case one is being processed.
+        sample = min(sample, now + self._size - self._server.getBufferSize())
+        n = min(sample - self._written, self._size)
+        if n <= 0:
+            return 0
+        values = self._curve.block(self._written - self._origin, n, self._sr)
+        position = (self._written - self._origin) % self._size
+        first = min(n, self._size - position)
+        self._buffer[position:position + first] = values[:first]
+        self._buffer[:n - first] = values[first:]
+        self._written = sample
+        return n
+
+    @property
+    def curve(self):
+        """Curve. Curve played."""
+        return self._curve
+
+    @property
+    def size(self):
+        """int. Length of the table, in samples."""
+        return self._size
+
+    @property
+    def origin(self):
+        """int. Server time, in samples, at which the curve starts."""
+        return self._origin
+
+    def __dir__(self):
+        return ["mul", "add"]
+
+
+# Run this script to time the curves of Pulsar.c5's presets, per block.
+if __name__ == "__main__":
+    import os
+    import timeit
+    from ground_state.pyo.utils.presets import readModulePresets
+
+    module = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                          os.pardir, 'Pulsar.c5')
+    for name, preset in sorted(readModulePresets(module).items()):
+        curves = graphCurves(preset, PULSAR_RANGES)
+        for param, curve in sorted(curves.items()):
+            usec = timeit.timeit(lambda: curve.block(48000, 256, 48000),
+                                 number=2000) / 2000 * 1e6
+            print("{0} / {1}: {2} points, {3:.1f} usec per 256 samples"
+                  .format(name, param, curve.points, usec))
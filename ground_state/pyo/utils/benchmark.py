@@ -0,0 +1,229 @@
+# encoding: utf-8
+
+# This is a benchmark suite for the pyo <http://code.google.com/p/pyo>
+# "instruments", generators and utilities. Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Measure what the instruments, generators and utilities cost.
+Call it thusly:
+    'python -m ground_state.pyo.utils.benchmark -o bench.json -c old.json'.
+
+Graph cases render offline and report CPU seconds per rendered second
+(lower is better), for every voice count and buffer size asked for; each
+runs in a fresh process, since pyo allows one server per process. The
+microbenchmarks report microseconds per call.
+
+Results are saved as JSON. When compared against a previous run, every case
+which got slower by more than the tolerance is flagged, and the exit status
+is 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+# Buffer sizes used with `serverSetup` in the songs (OSX, Windows).
+BUFSIZES = [192, 700]
+VOICES = [1, 8, 32]
+GRAPHS = ['aqueous', 'whale', 'tritable']
+# The full song, rendered through the render engine.
+SONG = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                    os.pardir, 'orca.py')
+
+
+def _buildVoices(graph, voices):
+    # internal function building `voices` copies of a benchmark graph, and
+    # returning every object to keep alive
+    from pyo import Metro, Osc, Sig, TrigFunc
+    from ground_state.pyo.generators.tritable import TriTable
+
+    keep = []
+    for i in range(voices):
+        freq = Sig(110 * (1 + 0.01 * i))
+        if graph == 'aqueous':
+            from ground_state.pyo.instruments.aqueous import Aqueous
+            voice = Aqueous(freq, dur=3.776).out()
+            trig = Metro(3.776 * 2).play()
+            keep.extend([trig, TrigFunc(trig, voice.play)])
+        elif graph == 'whale':
+            from ground_state.pyo.instruments.whale import Whale
+            trig = Metro(3.776).play()
+            voice = Whale(freq, trig, dur=3.776).out()
+            keep.append(trig)
+        elif graph == 'tritable':
+            voice = Osc(TriTable(order=50, size=24000), freq, interp=4,
+                        mul=0.1).out()
+        else:
+            raise ValueError("unknown graph {0!r}".format(graph))
+        keep.extend([freq, voice])
+    return keep
+
+
+def runGraph(case):
+    """
+    Render one graph case offline, and return its CPU seconds per rendered
+    second. Meant to run in a fresh worker process.
+
+    `case` is a dict with 'graph', 'voices', 'bufsize' and 'dur'.
+
+    """
+    fd, filename = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        if case['graph'] == 'orca':
+            from ground_state.pyo.utils.render import renderSong
+            report = renderSong(SONG, filename, case['dur'],
+                                bufsize=case['bufsize'])
+            return report['cpu'] / case['dur']
+
+        from pyo import Server
+        s = Server(sr=48000, nchnls=2, buffersize=case['bufsize'], duplex=0,
+                   audio='offline').boot()
+        keep = _buildVoices(case['graph'], case['voices'])
+        s.recordOptions(dur=case['dur'], filename=filename)
+        start = time.process_time()
+        s.start()
+        cpu = time.process_time() - start
+        s.shutdown()
+        return cpu / case['dur']
+    finally:
+        os.remove(filename)
+
+
+def graphCases(graphs=GRAPHS, voices=VOICES, bufsizes=BUFSIZES, dur=10.0,
+               song=True):
+    """Return the list of graph cases, each a dict for `runGraph`."""
+    cases = []
+    for bufsize in bufsizes:
+        for graph in graphs:
+            for n in voices:
+                cases.append({'name': '{0}/voices={1}/bufsize={2}'
+                                      .format(graph, n, bufsize),
+                              'graph': graph, 'voices': n,
+                              'bufsize': bufsize, 'dur': dur})
+        if song:
+            cases.append({'name': 'orca/bufsize={0}'.format(bufsize),
+                          'graph': 'orca', 'voices': 1, 'bufsize': bufsize,
+                          'dur': dur})
+    return cases
+
+
+def runGraphs(cases):
+    """Run every graph case, one fresh process each, one after the other."""
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        costs = pool.map(runGraph, cases, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return dict(('graph/' + case['name'], cost)
+                for case, cost in zip(cases, costs))
+
+
+def runMicro(number=20000):
+    """Return microseconds per call of the utility functions."""
+    from ground_state.pyo.generators.tritable import TriTable
+    from ground_state.pyo.utils.gain import dbToAmp
+    from ground_state.pyo.utils.tempo import Tempo
+
+    levels = np.linspace(-90.0, 12.0, 48000)
+    micro = {'Tempo(63.5)': (lambda: Tempo(63.5), number),
+             'dbToAmp(-12.0)': (lambda: dbToAmp(-12.0), number),
+             'dbToAmp(array[48000])': (lambda: dbToAmp(levels),
+                                       number // 100),
+             'TriTable._create_list(50)': (lambda: TriTable._create_list(50),
+                                           number)}
+    results = {}
+    for name, (func, n) in sorted(micro.items()):
+        # Best of 5, to keep scheduling noise out.
+        best = min(timeit.repeat(func, number=n, repeat=5))
+        results['micro/' + name] = best / n * 1e6
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Return the cases of `results` slower than in `baseline` by more than
+    `tolerance` (a fraction), as a list of (name, baseline, current) tuples.
+
+    Cases missing from either side are ignored.
+
+    """
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if old is not None and value > old * (1 + tolerance):
+            regressions.append((name, old, value))
+    return regressions
+
+
+def save(results, filename):
+    """Save `results` as a JSON baseline, along with the environment."""
+    import pyo
+    with open(filename, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'pyo': pyo.PYO_VERSION,
+                   'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'results': results}, f, indent=1, sort_keys=True)
+
+
+def load(filename):
+    """Return the results of a JSON baseline saved by `save`."""
+    with open(filename) as f:
+        return json.load(f)['results']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the instruments, generators and utilities.")
+    parser.add_argument('-o', '--output', default='bench.json',
+                        help="file to save the results in "
+                             "(default: bench.json)")
+    parser.add_argument('-c', '--compare',
+                        help="previous results to flag regressions against")
+    parser.add_argument('-t', '--tolerance', type=float, default=0.1,
+                        help="allowed slowdown, as a fraction (default: 0.1)")
+    parser.add_argument('-v', '--voices', type=int, nargs='+',
+                        default=VOICES,
+                        help="voice counts (default: {0})".format(VOICES))
+    parser.add_argument('-b', '--bufsizes', type=int, nargs='+',
+                        default=BUFSIZES,
+                        help="buffer sizes (default: {0})".format(BUFSIZES))
+    parser.add_argument('-d', '--dur', type=float, default=10.0,
+                        help="seconds rendered per graph case (default: 10)")
+    parser.add_argument('--no-song', dest='song', action='store_false',
+                        help="skip the full orca graph")
+    args = parser.parse_args(argv)
+
+    results = runMicro()
+    results.update(runGraphs(graphCases(GRAPHS, args.voices, args.bufsizes,
+                                        args.dur, args.song)))
+    for name, value in sorted(results.items()):
+        unit = 'us/call' if name.startswith('micro/') else 'cpu s/s'
+        print("{0:>40}: {1:.6f} {2}".format(name, value, unit))
+    save(results, args.output)
+
+    if args.compare:
+        regressions = compare(results, load(args.compare), args.tolerance)
+        for name, old, new in regressions:
+            print("REGRESSION {0}: {1:.6f} -> {2:.6f} ({3:+.1%})"
+                  .format(name, old, new, new / old - 1))
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# encoding: utf-8
+
+# This is a buffer size calibration tool for pyo <http://code.google.com/p/pyo>
+# songs. Latest version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Find the smallest buffer size a song can safely run at on this machine.
+Call it thusly:
+    'python -m ground_state.pyo.utils.calibrate orca.py -o orca.profile'
+and then, in the song:
+    'server = serverSetup(10, profile="orca.profile")'.
+
+For every candidate buffer size, the song's graph runs on the manual
+backend, in a fresh process, and each block is timed against its deadline
+(the time the block lasts at the sampling rate). The recommended size is the
+smallest one whose worst block leaves `headroom` of the deadline free, since
+a real device adds its own overhead to the processing measured here.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import time
+
+# Buffer sizes tried, smallest first.
+CANDIDATES = [64, 128, 192, 256, 384, 512, 700, 1024, 2048]
+# Fraction of every block's deadline left free.
+HEADROOM = 0.3
+
+
+def measureBlocks(case):
+    """
+    Run one song at one buffer size on the manual backend, and return its
+    per-block timings. Meant to run in a fresh worker process.
+
+    `case` is a dict with 'song', 'bufsize' and 'dur'. Returns a dict with
+    the buffer size, sampling rate, number of blocks, deadline, and the
+    worst, 99th percentile and mean block times, all in seconds.
+
+    """
+    from ground_state.pyo.utils.render import loadSong
+    from pyo import Server
+
+    server, songGlobals = loadSong(case['song'], case['bufsize'],
+                                   audio='manual')
+    sr = server.getSamplingRate()
+    bufsize = server.getBufferSize()
+    blocks = max(1, int(case['dur'] * sr / bufsize))
+    Server.start(server)
+    times = []
+    clock = time.perf_counter
+    for i in range(blocks):
+        start = clock()
+        server.process()
+        times.append(clock() - start)
+    server.stop()
+    server.shutdown()
+    times.sort()
+    return {'bufsize': bufsize,
+            'sr': sr,
+            'blocks': blocks,
+            'deadline': bufsize / float(sr),
+            'worst': times[-1],
+            'p99': times[int(0.99 * (blocks - 1))],
+            'mean': sum(times) / blocks}
+
+
+def recommend(results, headroom=HEADROOM):
+    """
+    Return the smallest buffer size of `results` (as from `measureBlocks`)
+    whose worst block fits in `1 - headroom` of its deadline, or None.
+
+    """
+    for result in sorted(results, key=lambda r: r['bufsize']):
+        if result['worst'] <= result['deadline'] * (1 - headroom):
+            return result['bufsize']
+    return None
+
+
+def calibrate(song, candidates=CANDIDATES, dur=20.0, headroom=HEADROOM):
+    """
+    Time the song at every candidate buffer size, and return a profile.
+
+    Candidates run one after the other, so they don't compete for the CPU.
+    The profile is a dict with the recommended 'bufsize' and 'sr', the
+    resulting 'latency' in seconds, the 'headroom' used, every candidate's
+    timings, and the machine it was measured on.
+
+    """
+    cases = [{'song': song, 'bufsize': bufsize, 'dur': dur}
+             for bufsize in sorted(candidates)]
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    try:
+        results = pool.map(measureBlocks, cases, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    bufsize = recommend(results, headroom)
+    if bufsize is None:
+        raise RuntimeError("no candidate buffer size is safe for {0}; the "
+                           "largest tried was {1}".format(song,
+                                                          max(candidates)))
+    sr = results[0]['sr']
+    return {'song': song,
+            'bufsize': bufsize,
+            'sr': sr,
+            'latency': bufsize / float(sr),
+            'headroom': headroom,
+            'candidates': results,
+            'machine': platform.node(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def saveProfile(profile, filename):
+    """Save a profile from `calibrate` as JSON."""
+    with open(filename, 'w') as f:
+        json.dump(profile, f, indent=1, sort_keys=True)
+
+
+def loadProfile(filename):
+    """Return a profile saved by `saveProfile`."""
+    with open(filename) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Find the smallest safe buffer size for a pyo song.")
+    parser.add_argument('song', help="song script, e.g. orca.py")
+    parser.add_argument('-o', '--output',
+                        help="profile to save (default: <song>.profile)")
+    parser.add_argument('-b', '--bufsizes', type=int, nargs='+',
+                        default=CANDIDATES,
+                        help="candidate buffer sizes (default: {0})"
+                             .format(CANDIDATES))
+    parser.add_argument('-d', '--dur', type=float, default=20.0,
+                        help="seconds run per candidate (default: 20)")
+    parser.add_argument('-m', '--headroom', type=float, default=HEADROOM,
+                        help="fraction of each block's deadline to leave "
+                             "free (default: {0})".format(HEADROOM))
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.song)[0] + '.profile'
+    profile = calibrate(args.song, args.bufsizes, args.dur, args.headroom)
+    for result in profile['candidates']:
+        print("{bufsize:>5}: worst {0:6.1%}, p99 {1:6.1%}, mean {2:6.1%} "
+              "of {3:.2f} ms".format(result['worst'] / result['deadline'],
+                                     result['p99'] / result['deadline'],
+                                     result['mean'] / result['deadline'],
+                                     result['deadline'] * 1000, **result))
+    print("Recommended buffer size: {bufsize} ({0:.1f} ms at {sr:.0f} Hz); "
+          "profile in {1}".format(profile['latency'] * 1000, output,
+                                  **profile))
+    saveProfile(profile, output)
+
+
+if __name__ == "__main__":
+    main()
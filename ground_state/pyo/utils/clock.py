@@ -0,0 +1,208 @@
+# encoding: utf-8
+
+# This is a master clock for pyo <http://code.google.com/p/pyo>, deriving
+# every rhythmic trigger of a song from a single pulse. Latest version
+# available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+One clock for the whole song.
+Use it thusly:
+    'clock = Clock(63.5).play()'
+    'metroWhale = clock.division(16)'
+    'delay = Delay(whale, delay=clock.tempo.whole, maxdelay=8)'
+    'clock.bind(delay, "delay", 4)'
+    'clock.schedule(64, 70.0)'.
+
+Separate `Metro`s drift apart, since each accumulates its own rounding.
+Here a single `Metro` ticks `ppq` times per beat; every other trigger counts
+its ticks, so all of them stay locked together, and a tempo change only
+has to move the one pulse.
+"""
+import bisect
+
+from pyo import PyoObject, Counter, Metro, Select, TrigFunc
+from ground_state.pyo.utils.tempo import Tempo
+
+
+class Clock(PyoObject):
+    """
+    Master clock.
+
+    Outputs a trigger on every tick, `ppq` ticks per beat. `division` derives
+    triggers every so many beats from the ticks, `bind` keeps attributes of
+    other objects (`Metro` times, `Delay` times, envelope durations...) set
+    to a number of beats, and `schedule` plans tempo changes at given beats.
+    On a tempo change the pulse and every bound attribute are updated at
+    once, from a single call.
+
+    Signal chain:
+    pulse -> tick counter -> select -> division
+    |
+    |-> out
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        bpm : float, optional
+            Tempo, in beats per minute. Defaults to 120.
+        ppq : int, optional
+            Ticks per beat (quarter note). Every division must be a whole
+            number of ticks. Defaults to 4.
+
+    >>> s = Server().boot()
+    >>> s.start()
+    >>> clock = Clock(63.5).play()
+    >>> env = TrigEnv(clock.division(4), HannTable(), dur=clock.tempo.whole)
+    >>> clock.bind(env, 'dur', 4)
+    >>> a = Sine(220, mul=env).out()
+    >>> clock.schedule(16, 90.0)
+
+    """
+    def __init__(self, bpm=120, ppq=4):
+        PyoObject.__init__(self)
+        self._tempo = Tempo(bpm)
+        self._ppq = ppq
+
+        self._pulse = Metro(self._tempo.spb / ppq)
+        self._base_objs = self._pulse.getBaseObjects()
+        # Ticks per division -> (tick counter, select).
+        self._divisions = {}
+        # (object, attribute, beats).
+        self._bindings = []
+        # Sorted (beat, bpm) tempo changes still to come.
+        self._tempoMap = []
+        # Ticks and beats since the clock was last played (`play` resets
+        # them). They are counted from here rather than from the first
+        # `schedule`, so that beats and late divisions stay on the grid.
+        self._ticks = 0
+        self._beat = 0
+        self._tickFunc = TrigFunc(self._pulse, self._onTick)
+
+    def division(self, beats):
+        """
+        Return a trigger stream firing every `beats` beats, from the first
+        tick on. Divisions of the same length are shared.
+
+        :Args:
+
+            beats : float
+                Length of the division, e.g. 4 for a whole note, 0.5 for an
+                eighth note.
+
+        """
+        ticks = beats * self._ppq
+        if ticks < 1 or abs(ticks - round(ticks)) > 1e-9:
+            raise ValueError("{0} beats isn't a whole number of ticks at {1} "
+                             "ticks per beat".format(beats, self._ppq))
+        ticks = int(round(ticks))
+        if ticks == 1:
+            return self._pulse
+        if ticks not in self._divisions:
+            counter = Counter(self._pulse, min=0, max=ticks)
+            # A division made while the clock runs starts in phase with the
+            # ticks already gone by.
+            counter.reset(self._ticks % ticks)
+            self._divisions[ticks] = (counter, Select(counter, 0))
+        return self._divisions[ticks][1]
+
+    def bind(self, obj, attr, beats):
+        """
+        Set the attribute `attr` of `obj` to the length of `beats` beats, in
+        seconds, now and after every tempo change.
+
+        :Args:
+
+            obj : object
+                Object to update, e.g. a `Delay`.
+            attr : str
+                Name of the attribute, e.g. 'delay'.
+            beats : float
+                Length in beats.
+
+        """
+        self._bindings.append((obj, attr, beats))
+        setattr(obj, attr, beats * self._tempo.spb)
+
+    def unbind(self, obj):
+        """Stop updating every attribute bound on `obj`."""
+        self._bindings = [b for b in self._bindings if b[0] is not obj]
+
+    def setTempo(self, x):
+        """
+        Change the tempo, updating the pulse and every bound attribute.
+
+        :Args:
+
+            x : float
+                New tempo, in beats per minute.
+
+        """
+        self._tempo.setTempo(x)
+        spb = self._tempo.spb
+        self._pulse.time = spb / self._ppq
+        for obj, attr, beats in self._bindings:
+            setattr(obj, attr, beats * spb)
+
+    def schedule(self, beat, bpm):
+        """
+        Plan a tempo change to `bpm` at the start of beat `beat` (counted
+        from 0 when the clock is played).
+
+        The change is applied from the beat's trigger, so it takes effect at
+        the next audio block.
+
+        """
+        bisect.insort(self._tempoMap, (beat, bpm))
+
+    def _onTick(self):
+        # internal method counting ticks, and beats on every `ppq`th one
+        beat = self._ticks % self._ppq == 0
+        self._ticks += 1
+        if beat:
+            self._onBeat()
+
+    def _onBeat(self):
+        # internal method applying the tempo changes due at this beat
+        while self._tempoMap and self._tempoMap[0][0] <= self._beat:
+            self.setTempo(self._tempoMap.pop(0)[1])
+        self._beat += 1
+
+    def play(self, dur=0, delay=0):
+        self._ticks = 0
+        self._beat = 0
+        for counter, select in self._divisions.values():
+            counter.reset()
+        return PyoObject.play(self, dur, delay)
+
+    @property
+    def tempo(self):
+        """Tempo. Current note values, in seconds."""
+        return self._tempo
+
+    @property
+    def bpm(self):
+        """float. Tempo, in beats per minute."""
+        return self._tempo.bpm
+
+    @bpm.setter
+    def bpm(self, x):
+        self.setTempo(x)
+
+    @property
+    def ppq(self):
+        """int. Ticks per beat."""
+        return self._ppq
+
+    @property
+    def tempoMap(self):
+        """list. (beat, bpm) tempo changes still to come."""
+        return list(self._tempoMap)
+
+    def __dir__(self):
+        return ["bpm"]
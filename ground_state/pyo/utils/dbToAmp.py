@@ -11,10 +11,6 @@
 # (at your option) any later version <http://www.gnu.org/licenses/>.
 
 # dbToAmp 1.0
-import math
-
-
-def dbToAmp(db):
-    return math.pow(10, 0.05*db)
-
-# amps to dB: log(dB) / 0.05
+# Kept for the songs importing it from here; see `gain` for the inverse,
+# vectorized and audio-rate conversions.
+from ground_state.pyo.utils.gain import dbToAmp, ampToDb  # noqa: F401
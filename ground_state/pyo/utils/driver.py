@@ -0,0 +1,188 @@
+# encoding: utf-8
+
+# This is a headless block-stepping driver for pyo
+# <http://code.google.com/p/pyo>, built on asyncio. Latest version available
+# from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Run a pyo graph block by block from asyncio, without a GUI or a device.
+Use it thusly:
+    's = serverSetup(None, 256, 'manual')'
+    'driver = BlockDriver(s)'
+    'async def melody():'
+    '    for f in [220, 330, 440]:'
+    '        osc.freq = f'
+    '        await driver.sleep(0.5)'
+    'asyncio.run(driver.run(2.0, melody()))'.
+
+Time is counted in samples processed, not read from a clock, so a run does
+the same thing every time. Paced runs (`realtime=True`) sleep between blocks
+to follow the wall clock; unpaced runs go as fast as the CPU allows, only
+yielding to the other coroutines between blocks.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+
+from pyo import Server
+
+
+class BlockDriver(object):
+    """
+    BlockDriver 1.0
+
+    Advances a server on the manual backend one block at a time, from an
+    asyncio loop. Between two blocks, every coroutine or callback due by
+    then runs; whatever they change takes effect from the next block.
+
+    :Args:
+
+        server : Server
+            Booted server, using the 'manual' backend.
+        realtime : bool, optional
+            Pace the blocks to the wall clock. Defaults to False, as fast as
+            possible.
+
+    """
+    def __init__(self, server, realtime=False):
+        self._server = server
+        self._realtime = realtime
+        self._bufsize = server.getBufferSize()
+        self._sr = server.getSamplingRate()
+        self._blocks = 0
+        self._running = False
+        # (sample, order, future or callable, args) heap.
+        self._pending = []
+        self._order = itertools.count()
+
+    @property
+    def blocks(self):
+        """int. Number of blocks processed."""
+        return self._blocks
+
+    @property
+    def samples(self):
+        """int. Number of samples processed."""
+        return self._blocks * self._bufsize
+
+    @property
+    def time(self):
+        """float. Audio time, in seconds."""
+        return self.samples / self._sr
+
+    @property
+    def realtime(self):
+        """bool. Whether the blocks are paced to the wall clock."""
+        return self._realtime
+
+    def _at(self, seconds):
+        # internal method returning the sample `seconds` from now
+        return self.samples + int(round(seconds * self._sr))
+
+    def call(self, seconds, function, *args):
+        """Call `function(*args)` `seconds` of audio time from now."""
+        heapq.heappush(self._pending, (self._at(seconds), next(self._order),
+                                       function, args))
+
+    def sleep(self, seconds):
+        """
+        Return an awaitable which completes `seconds` of audio time from now
+        (at the first block boundary at or after it).
+
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._pending, (self._at(seconds), next(self._order),
+                                       future, ()))
+        return future
+
+    def nextBlock(self):
+        """Return an awaitable which completes before the next block."""
+        return self.sleep(0)
+
+    def _wake(self):
+        # internal method running everything due before the next block
+        now = self.samples
+        while self._pending and self._pending[0][0] <= now:
+            sample, order, target, args = heapq.heappop(self._pending)
+            if isinstance(target, asyncio.Future):
+                if not target.done():
+                    target.set_result(self.time)
+            else:
+                target(*args)
+
+    async def run(self, dur=None, *coroutines):
+        """
+        Process blocks for `dur` seconds (or until `stop`), running the
+        given coroutines alongside. Returns the number of blocks processed.
+
+        The server is started if it wasn't. Coroutines still running when
+        the driver stops are cancelled. If one of them raises, the driver
+        stops, and `run` raises the first such exception.
+
+        """
+        if not self._server.getIsStarted():
+            Server.start(self._server)
+        tasks = [asyncio.ensure_future(c) for c in coroutines]
+        for task in tasks:
+            task.add_done_callback(self._taskDone)
+        end = None if dur is None else self._at(dur)
+        blockTime = self._bufsize / float(self._sr)
+        start = time.perf_counter()
+        first = self._blocks
+        self._running = True
+        try:
+            # Let the coroutines run up to their first wait.
+            await asyncio.sleep(0)
+            while self._running and (end is None or self.samples < end):
+                self._wake()
+                # Let whatever was woken up run before the block.
+                await asyncio.sleep(0)
+                self._server.process()
+                self._blocks += 1
+                if self._realtime:
+                    ahead = (start + (self._blocks - first) * blockTime -
+                             time.perf_counter())
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+        finally:
+            self._running = False
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Coroutines cancelled above are expected; anything else isn't.
+        for result in results:
+            if (isinstance(result, BaseException) and
+                    not isinstance(result, asyncio.CancelledError)):
+                raise result
+        return self._blocks - first
+
+    def _taskDone(self, task):
+        # internal method stopping the run when a coroutine raised
+        if not task.cancelled() and task.exception() is not None:
+            self._running = False
+
+    def stop(self):
+        """Stop `run` before the next block."""
+        self._running = False
+
+
+def driveSong(path, dur, *coroutines, realtime=False, bufsize=None):
+    """
+    Load the song script at `path` on the manual backend and run it for
+    `dur` seconds, with the given coroutine functions (called with the
+    driver and the song's globals) alongside. Returns the driver.
+
+    """
+    from ground_state.pyo.utils.render import loadSong
+
+    server, songGlobals = loadSong(path, bufsize, audio='manual')
+    driver = BlockDriver(server, realtime)
+    asyncio.run(driver.run(dur, *[c(driver, songGlobals)
+                                  for c in coroutines]))
+    return driver
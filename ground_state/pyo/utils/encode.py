@@ -0,0 +1,346 @@
+# encoding: utf-8
+
+# This is a streaming multi-format encoder for pyo
+# <http://code.google.com/p/pyo> renders. Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Encode rendered audio to several files at once, while it is rendered.
+Use it thusly:
+    'pipeline = EncoderPipeline(['orca.wav', 'orca.flac', 'orca.ogg'],'
+    '                           sr=44100, nchnls=2)'
+    'for block in blocks:'
+    '    pipeline.write(block)'
+    'report = pipeline.close()'
+or, for a song script:
+    'python -m ground_state.pyo.utils.render orca.py -o orca.wav -o orca.ogg'.
+
+Blocks are gathered into chunks of `chunk` frames, and every chunk is put on
+the queue of every encoder. Each encoder runs in a thread of its own, taking
+chunks from its queue in order; libsndfile releases the GIL while it
+encodes, so the encoders and the render run side by side. Queues hold at
+most `queueSize` chunks: once an encoder is that far behind, `write` waits
+for it, so a render never gets further ahead of its slowest encoder than
+that, however long it is.
+
+WAV, FLAC and Ogg Vorbis (anything libsndfile writes, really) are encoded
+through the `soundfile` package. Without it, only WAV files of integer
+samples can be written, with the `wave` module.
+"""
+import os
+import queue
+import threading
+import time
+import wave
+
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+# Maps a file extension to a libsndfile format.
+FORMATS = {'.wav': 'WAV',
+           '.aif': 'AIFF',
+           '.aiff': 'AIFF',
+           '.flac': 'FLAC',
+           '.ogg': 'OGG'}
+# Maps a `Server.recordOptions` sample type to a libsndfile subtype.
+SUBTYPES = ['PCM_16', 'PCM_24', 'PCM_32', 'FLOAT', 'DOUBLE', 'ULAW', 'ALAW']
+# Frames per chunk put on the queues.
+CHUNK = 8192
+# Chunks an encoder may fall behind before `write` waits for it.
+QUEUE_SIZE = 16
+
+
+def _subtype(fmt, sampletype):
+    # internal function returning the subtype to write `fmt` with
+    if fmt == 'OGG':
+        return 'VORBIS'
+    if fmt == 'FLAC' and sampletype not in (0, 1):
+        # FLAC only stores integers, 24 bits at most.
+        return 'PCM_24'
+    return SUBTYPES[sampletype]
+
+
+class _WaveFile(object):
+    # internal class writing integer WAV files without `soundfile`
+    def __init__(self, filename, sr, nchnls, sampletype):
+        if sampletype not in (0, 1, 2):
+            raise ValueError("without the soundfile package, only 16, 24 "
+                             "and 32 bits integer WAV files can be written")
+        self._width = (2, 3, 4)[sampletype]
+        self._file = wave.open(filename, 'wb')
+        self._file.setnchannels(nchnls)
+        self._file.setsampwidth(self._width)
+        self._file.setframerate(int(sr))
+
+    def write(self, chunk):
+        scale = 2 ** (8 * self._width - 1)
+        samples = np.clip(np.round(chunk * scale), -scale, scale - 1)
+        samples = samples.astype('<i4')
+        if self._width == 3:
+            # Drop the top byte of every little endian 32 bits sample.
+            samples = samples.view(np.uint8).reshape(-1, 4)[:, :3]
+        elif self._width == 2:
+            samples = samples.astype('<i2')
+        self._file.writeframes(samples.tobytes())
+
+    def close(self):
+        self._file.close()
+
+
+class Encoder(object):
+    """
+    Encoder 1.0
+
+    One output file, written from a thread of its own; fed by an
+    `EncoderPipeline`.
+
+    :Args:
+
+        filename : str
+            Output file; its extension selects the format (see `FORMATS`).
+        sr : float
+            Sampling rate.
+        nchnls : int
+            Number of channels.
+        sampletype : int, optional
+            Sample type, as for `Server.recordOptions`; Ogg is always Vorbis,
+            and FLAC at most 24 bits. Defaults to 0, 16 bits int.
+        quality : float, optional
+            Ogg Vorbis quality, from 0 to 1. Defaults to 0.4.
+        queueSize : int, optional
+            Chunks waiting to be encoded before `put` waits. Defaults to
+            `QUEUE_SIZE`.
+
+    """
+    def __init__(self, filename, sr, nchnls, sampletype=0, quality=0.4,
+                 queueSize=QUEUE_SIZE):
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in FORMATS:
+            raise ValueError("unknown file format {0!r}; expected one of {1}"
+                             .format(ext, sorted(FORMATS)))
+        self._filename = filename
+        self._format = FORMATS[ext]
+        if soundfile is not None:
+            subtype = _subtype(self._format, sampletype)
+            # libsndfile's compression level goes the other way: 0 is the
+            # best quality.
+            level = 1.0 - quality if subtype == 'VORBIS' else None
+            self._file = soundfile.SoundFile(filename, 'w', int(sr), nchnls,
+                                             subtype, format=self._format,
+                                             compression_level=level)
+        elif self._format == 'WAV':
+            self._file = _WaveFile(filename, sr, nchnls, sampletype)
+        else:
+            raise ValueError("writing {0} files needs the soundfile package"
+                             .format(self._format))
+        self._sr = sr
+        self._queue = queue.Queue(queueSize)
+        self._frames = 0
+        self._busy = 0.0
+        self._waited = 0.0
+        self._deepest = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='Encoder ' + filename)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        # internal method encoding chunks until told to stop (with None)
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is not None:
+                # Drain the queue, so `put` never blocks on a dead encoder.
+                continue
+            start = time.perf_counter()
+            try:
+                self._file.write(chunk)
+                self._frames += len(chunk)
+            except Exception as e:
+                self._error = e
+            self._busy += time.perf_counter() - start
+        self._file.close()
+
+    def put(self, chunk):
+        """
+        Queue `chunk` (a (frames, nchnls) array, which must not be modified
+        afterwards) for encoding, waiting if the queue is full. Once encoding
+        has failed, chunks are dropped; `close` raises the error.
+
+        """
+        if self._error is not None:
+            return
+        self._deepest = max(self._deepest, self._queue.qsize())
+        start = time.perf_counter()
+        self._queue.put(chunk)
+        self._waited += time.perf_counter() - start
+
+    def close(self):
+        """
+        Encode whatever is queued, close the file and return a report (see
+        `report`). Raises whatever error encoding met.
+
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.report()
+
+    def report(self):
+        """
+        Return a dict with the 'file', its 'format', the seconds of audio
+        encoded ('dur'), the seconds spent encoding them ('busy'), the
+        'throughput' (seconds of audio per second of encoding), the
+        seconds `put` waited for room ('waited'), and the 'deepest' the
+        queue got.
+
+        """
+        dur = self._frames / float(self._sr)
+        return {'file': self._filename,
+                'format': self._format,
+                'dur': dur,
+                'busy': self._busy,
+                'throughput': dur / self._busy if self._busy > 0
+                              else float('inf'),
+                'waited': self._waited,
+                'deepest': self._deepest}
+
+    @property
+    def filename(self):
+        """str. Output file."""
+        return self._filename
+
+
+class EncoderPipeline(object):
+    """
+    EncoderPipeline 1.0
+
+    Writes the same audio to several files at once, each encoded in a
+    thread of its own. See the module docstring.
+
+    :Args:
+
+        filenames : list of str
+            Output files; their extensions select their formats.
+        sr : float
+            Sampling rate.
+        nchnls : int
+            Number of channels.
+        sampletype : int, optional
+            Sample type, as for `Server.recordOptions`. Defaults to 0.
+        quality : float, optional
+            Ogg Vorbis quality, from 0 to 1. Defaults to 0.4.
+        chunk : int, optional
+            Frames per chunk put on the queues. Defaults to `CHUNK`.
+        queueSize : int, optional
+            Chunks an encoder may fall behind. Defaults to `QUEUE_SIZE`.
+
+    """
+    def __init__(self, filenames, sr, nchnls, sampletype=0, quality=0.4,
+                 chunk=CHUNK, queueSize=QUEUE_SIZE):
+        self._nchnls = nchnls
+        self._chunk = chunk
+        self._encoders = []
+        try:
+            for f in filenames:
+                self._encoders.append(Encoder(f, sr, nchnls, sampletype,
+                                              quality, queueSize))
+        except Exception:
+            # Don't leave the files already opened (and their threads)
+            # behind.
+            for encoder in self._encoders:
+                try:
+                    encoder.close()
+                except Exception:
+                    pass
+            raise
+        self._buffer = np.empty((chunk, nchnls), dtype=np.float64)
+        self._fill = 0
+        self._closed = False
+
+    def write(self, block):
+        """
+        Append `block` (a (frames, nchnls) array, or interleaved samples) to
+        every file. The block is copied; it can be reused afterwards.
+
+        """
+        block = np.asarray(block).reshape(-1, self._nchnls)
+        while len(block):
+            n = min(len(block), self._chunk - self._fill)
+            self._buffer[self._fill:self._fill + n] = block[:n]
+            self._fill += n
+            block = block[n:]
+            if self._fill == self._chunk:
+                self._flush()
+
+    def _flush(self):
+        # internal method handing the chunk gathered so far to the encoders
+        if self._fill == 0:
+            return
+        # Every encoder reads the same chunk; none of them modifies it.
+        chunk = self._buffer[:self._fill]
+        self._buffer = np.empty_like(self._buffer)
+        self._fill = 0
+        for encoder in self._encoders:
+            encoder.put(chunk)
+
+    def close(self):
+        """
+        Flush and close every file, and return a list of their reports (see
+        `Encoder.report`). Every file is closed, even if encoding some of
+        them failed; the first error met is raised afterwards.
+
+        """
+        if self._closed:
+            return [encoder.report() for encoder in self._encoders]
+        self._closed = True
+        self._flush()
+        reports = []
+        errors = []
+        for encoder in self._encoders:
+            try:
+                reports.append(encoder.close())
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return reports
+
+    @property
+    def filenames(self):
+        """list. Output files."""
+        return [encoder.filename for encoder in self._encoders]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+            return
+        # Already unwinding: close the files, but let the first error be the
+        # one raised.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def formatReports(reports):
+    """Return encoder reports as a few lines of text."""
+    return "\n".join(
+        "{file} ({format}): {dur:.1f}s encoded in {busy:.3f}s "
+        "({throughput:.0f}x real time), waited {waited:.3f}s, queue "
+        "{deepest} deep".format(**report) for report in reports)
@@ -0,0 +1,349 @@
+# encoding: utf-8
+
+# This is an event scheduler for pyo <http://code.google.com/p/pyo>, which
+# computes note events ahead of time, away from the audio thread. Latest
+# version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Compute note events ahead of time, and play them at exact samples.
+Use it thusly:
+    'sched = EventScheduler(s)'
+    'freq = sched.lane(init=261.6256)'
+    'sched.repeat(0.125, freq, chooseLeadStep)'
+    'lead = SineLoop(freq, feedback=0.12).out()'
+    'sched.start()'.
+
+`TrigFunc` and `Pattern` run Python inside the audio callback, on every
+trigger. Here, events are computed by a worker thread (or an asyncio task)
+up to `lookahead` seconds before they are due, and written straight into
+the tables of an `EventLane`, where the audio side reads them like any
+other signal: no Python runs on the audio thread, and no lock is taken.
+"""
+import asyncio
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+from pyo import PyoObject, DataTable, SampHold, TableRead
+
+
+class EventLane(PyoObject):
+    """
+    Sample-accurate event stream, written ahead of time from Python.
+
+    Two tables of `size` samples are read in a loop, one sample per sample:
+    one holds a 1 wherever an event happens, the other the event's value.
+    The output holds the value of the latest event; `trig` outputs a trigger
+    at every event, usable wherever pyo expects one (`TrigEnv`, `Whale`...).
+    Events are written by an `EventScheduler`, which also clears them once
+    they have been played.
+
+    Events must be at least 2 samples apart: the sample & hold only samples
+    again once the trigger has fallen back to 0, so an event on the sample
+    right after another would keep the first one's value. `write` refuses
+    those. Two events on the same sample are one event, of the latest value.
+
+    Signal chain:
+    trigger table -> reader ---------------> trig
+    |                     |
+    value table -> reader -> sample & hold -> out
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        init : float, optional
+            Output until the first event. Defaults to 0.
+        size : int, optional
+            Length of the tables, in samples; events can't be written further
+            ahead than this. Must be a power of 2, so the readers advance by
+            exactly one sample per sample. Defaults to 65536.
+
+    """
+    def __init__(self, init=0.0, size=65536, mul=1, add=0):
+        if size & (size - 1):
+            raise ValueError("size must be a power of 2, not {0}"
+                             .format(size))
+        PyoObject.__init__(self, mul, add)
+        self._init = init
+        self._size = size
+        self._mul = mul
+        self._add = add
+
+        self._trigTable = DataTable(size)
+        self._valueTable = DataTable(size)
+        # The readers start with the next block, at the current time.
+        self._origin = self._trigTable.getServer().getCurrentTimeInSamples()
+        self.write(self._origin, init)
+        self._trig = TableRead(self._trigTable,
+                               freq=self._trigTable.getRate(), loop=1,
+                               interp=1).play()
+        self._values = TableRead(self._valueTable,
+                                 freq=self._valueTable.getRate(), loop=1,
+                                 interp=1).play()
+        self._hold = SampHold(self._values, self._trig, 1.0, mul=self._mul,
+                              add=self._add)
+        self._base_objs = self._hold.getBaseObjects()
+
+    def _position(self, sample):
+        # internal method mapping a server time to a table position
+        return (sample - self._origin) % self._size
+
+    def write(self, sample, value=1.0):
+        """
+        Write an event of `value` at the server time `sample`. Raises
+        ValueError if there is an event on a neighbouring sample.
+
+        """
+        position = self._position(sample)
+        for neighbour in (position - 1, position + 1):
+            if self._trigTable.get(neighbour % self._size) == 1.0:
+                raise ValueError("an event at sample {0} would be next to "
+                                 "another one".format(sample))
+        self._valueTable.put(value, position)
+        self._trigTable.put(1.0, position)
+
+    def erase(self, sample):
+        """Erase the event at the server time `sample`."""
+        self._trigTable.put(0.0, self._position(sample))
+
+    @property
+    def trig(self):
+        """PyoObject. Trigger at every event."""
+        return self._trig
+
+    @property
+    def size(self):
+        """int. Length of the tables, in samples."""
+        return self._size
+
+    @property
+    def origin(self):
+        """int. Server time, in samples, of the tables' first sample."""
+        return self._origin
+
+    def __dir__(self):
+        return ["mul", "add"]
+
+
+class EventScheduler(object):
+    """
+    EventScheduler 1.0
+
+    Collects timestamped events from any thread through a lock-free queue
+    (`push`), generates repeating ones (`repeat`), and writes every event
+    due within `lookahead` seconds into its `EventLane`, and every
+    `Automation` given to `automate` as far ahead. `pump` does one
+    round of that; `start` runs it on a worker thread, and `run` from an
+    asyncio loop.
+
+    Times are in seconds of server time (`Server.getCurrentTimeInSamples`
+    divided by the sampling rate). An event which is already due when it is
+    written is dropped, and counted in `late`; one on the sample next to
+    another event of its lane (see `EventLane`), counted in `crowded`.
+
+    :Args:
+
+        server : Server
+            Booted server.
+        lookahead : float, optional
+            How far ahead events are written, in seconds. Must be longer than
+            the time between two rounds, plus a block. Defaults to 0.25.
+
+    """
+    def __init__(self, server, lookahead=0.25):
+        self._server = server
+        self._sr = server.getSamplingRate()
+        self._bufsize = server.getBufferSize()
+        self._lookahead = lookahead
+        self._lanes = []
+        # Appending and popping both ends of a deque are atomic, so
+        # producers never block.
+        self._queue = collections.deque()
+        # (sample, order, lane, value) heaps, of events to write, and of
+        # events written but not cleared.
+        self._pending = []
+        self._written = []
+        self._order = itertools.count()
+        # [next time, period, lane, function] lists.
+        self._repeats = []
+        # Objects with a `fill(sample)` method, such as `Automation`.
+        self._automations = []
+        self._late = 0
+        self._crowded = 0
+        # Rounds of the worker thread which raised, and the first error.
+        self._failed = 0
+        self._error = None
+        self._thread = None
+        self._running = False
+
+    def lane(self, init=0.0, size=65536):
+        """Return a new `EventLane` written by this scheduler."""
+        if size < self._lookahead * self._sr + 2 * self._bufsize:
+            raise ValueError("lane too short for a {0}s lookahead"
+                             .format(self._lookahead))
+        lane = EventLane(init, size)
+        # The initial value is an event too, to be cleared once played.
+        heapq.heappush(self._written, (lane.origin, next(self._order), lane,
+                                       init))
+        self._lanes.append(lane)
+        return lane
+
+    def automate(self, automation):
+        """
+        Keep `automation` (an `Automation`, or anything with a
+        `fill(sample)` method and a `size`) written `lookahead` ahead.
+
+        """
+        if automation.size < self._lookahead * self._sr + 2 * self._bufsize:
+            raise ValueError("automation too short for a {0}s lookahead"
+                             .format(self._lookahead))
+        self._automations.append(automation)
+        return automation
+
+    def now(self):
+        """Return the server time, in seconds."""
+        return self._server.getCurrentTimeInSamples() / self._sr
+
+    def push(self, when, lane, value=1.0):
+        """
+        Queue an event of `value` on `lane` at server time `when` (seconds).
+        Safe to call from any thread.
+
+        """
+        self._queue.append((when, lane, value))
+
+    def repeat(self, period, lane, function, start=None):
+        """
+        Call `function(when)` ahead of every time `when` from `start` (the
+        current time by default) every `period` seconds, and play what it
+        returns as an event on `lane`; None means no event.
+
+        `function` runs on the scheduler's thread, `lookahead` seconds early.
+
+        """
+        if start is None:
+            start = self.now()
+        self._repeats.append([start, period, lane, function])
+
+    def _add(self, when, lane, value):
+        # internal method moving an event to the pending heap
+        sample = int(round(when * self._sr))
+        heapq.heappush(self._pending, (sample, next(self._order), lane,
+                                       value))
+
+    def pump(self):
+        """Write every event due within `lookahead`, and clear old ones."""
+        now = self._server.getCurrentTimeInSamples()
+        horizon = now / self._sr + self._lookahead
+        while self._queue:
+            self._add(*self._queue.popleft())
+        for rep in self._repeats:
+            while rep[0] < horizon:
+                value = rep[3](rep[0])
+                if value is not None:
+                    self._add(rep[0], rep[2], value)
+                rep[0] += rep[1]
+        horizon = int(horizon * self._sr)
+        for automation in self._automations:
+            automation.fill(horizon)
+        while self._pending and self._pending[0][0] < horizon:
+            event = heapq.heappop(self._pending)
+            if event[0] < now:
+                self._late += 1
+                continue
+            try:
+                event[2].write(event[0], event[3])
+            except ValueError:
+                self._crowded += 1
+                continue
+            heapq.heappush(self._written, event)
+        # Keep a block of margin, in case one is being processed.
+        while self._written and self._written[0][0] < now - self._bufsize:
+            event = heapq.heappop(self._written)
+            event[2].erase(event[0])
+
+    def start(self, interval=0.02):
+        """
+        Run `pump` every `interval` seconds on a worker thread. A round
+        which raises (in a `repeat` function, or an automation's `fill`)
+        is counted in `failed`, and the thread goes on; `stop` raises the
+        first such error.
+
+        """
+        if self._thread is not None:
+            return self
+        self._running = True
+
+        def loop():
+            while self._running:
+                try:
+                    self.pump()
+                except Exception as e:
+                    self._failed += 1
+                    if self._error is None:
+                        self._error = e
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=loop, name='EventScheduler')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the worker thread or the asyncio task. Raises the first error
+        a round of the worker thread met, if any.
+
+        """
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def run(self, interval=0.02, sleep=asyncio.sleep):
+        """
+        Run `pump` every `interval` seconds from an asyncio loop, until
+        `stop`. With a `BlockDriver`, pass its `sleep`, to count intervals
+        in audio time.
+
+        """
+        self._running = True
+        while self._running:
+            self.pump()
+            await sleep(interval)
+
+    @property
+    def lookahead(self):
+        """float. How far ahead events are written, in seconds."""
+        return self._lookahead
+
+    @property
+    def late(self):
+        """int. Number of events dropped for being written too late."""
+        return self._late
+
+    @property
+    def crowded(self):
+        """int. Number of events dropped for being next to another one."""
+        return self._crowded
+
+    @property
+    def failed(self):
+        """int. Number of rounds of the worker thread which raised."""
+        return self._failed
+
+    @property
+    def pending(self):
+        """int. Number of events queued but not yet written."""
+        return len(self._pending) + len(self._queue)
@@ -0,0 +1,238 @@
+# encoding: utf-8
+
+# This is a memory and object accounting tool for pyo
+# <http://code.google.com/p/pyo> "instruments". Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Report what an instrument, or a whole server, holds in memory.
+Call it thusly:
+    'print(footprint(aqueous))'
+    'print(serverFootprint())'
+or, for one voice of every instrument:
+    'python -m ground_state.pyo.utils.footprint'.
+
+A footprint walks the objects an instrument holds, down through the pyo
+objects they hold, and counts:
+    'objects'       pyo objects (Python side).
+    'baseObjects'   C objects behind them: audio streams and tables.
+    'streams'       audio streams, each processed every block.
+    'outputs'       the instrument's own output streams.
+    'tableBytes'    memory held by its tables' samples, of which
+    'sharedBytes'   is held by tables shared through the table cache.
+    'delayBytes'    memory held by its delay lines.
+    'unsized'       objects with delay lines of their own (reverbs...) whose
+                    size isn't known here.
+    'classes'       number of pyo objects of every class.
+
+Samples are 4 bytes, or 8 under pyo64 (as used by the radiopyo script), so
+table and delay line sizes double there. Objects reachable from the
+instrument's own arguments (its `freq`, `trig`...) belong to whoever built
+them, and aren't counted.
+"""
+import collections
+import gc
+import inspect
+import weakref
+
+from pyo import PyoObject, PyoObjectBase, PyoTableObject
+from ground_state.pyo.generators.tablecache import SAMPLE_BYTES, tableCache
+
+# Objects with delay lines sized by their `maxdelay`, in seconds.
+MAXDELAY = ('Delay', 'SDelay', 'SmoothDelay')
+# Objects with delay lines sized by their `minfreq`, in Hz.
+MINFREQ = ('Waveguide', 'AllpassWG')
+# Objects with delay lines of their own, of sizes not exposed to Python.
+UNSIZED = ('Chorus', 'Freeverb', 'Harmonizer', 'STRev', 'WGVerb')
+
+
+def _isPyo(obj):
+    # internal function telling whether `obj` is a pyo object (weak proxies
+    # pass for the object they point to)
+    return (isinstance(obj, PyoObjectBase) and
+            not isinstance(obj, weakref.ProxyTypes))
+
+
+def _children(obj):
+    # internal function returning the objects `obj` holds
+    if isinstance(obj, weakref.ProxyTypes):
+        return []
+    if isinstance(obj, (list, tuple, set)):
+        return list(obj)
+    if isinstance(obj, dict):
+        return list(obj.values())
+    if _isPyo(obj) or _isOurs(obj):
+        try:
+            return list(vars(obj).values())
+        except TypeError:
+            return []
+    return []
+
+
+def _isOurs(obj):
+    # internal function telling whether `obj` is one of this repo's helpers
+    # (IdleGate, GainFolder...), which hold pyo objects too
+    return type(obj).__module__.startswith('ground_state.')
+
+
+def _walk(roots, exclude=()):
+    # internal function returning every pyo object reachable from `roots`,
+    # without going through `exclude`
+    seen = set(id(x) for x in exclude)
+    found = []
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if _isPyo(obj):
+            found.append(obj)
+        stack.extend(_children(obj))
+    return found
+
+
+def _arguments(obj):
+    # internal function returning the values of `obj`'s constructor
+    # arguments, as stored on it (`self._freq`...)
+    try:
+        names = inspect.signature(type(obj).__init__).parameters
+    except (TypeError, ValueError):
+        return []
+    return [getattr(obj, '_' + name) for name in names
+            if name != 'self' and hasattr(obj, '_' + name)]
+
+
+def _delayBytes(obj, sr):
+    # internal function returning the bytes of `obj`'s delay lines, or None
+    # if it has some of a size unknown here
+    name = type(obj).__name__
+    if name in MAXDELAY:
+        sizes = getattr(obj, '_maxdelay', 1.0)
+        factor = 1.0
+    elif name in MINFREQ:
+        sizes = getattr(obj, '_minfreq', 20.0)
+        factor = -1.0
+    elif name in UNSIZED:
+        return None
+    else:
+        return 0
+    if not isinstance(sizes, list):
+        sizes = [sizes]
+    total = 0
+    for i in range(len(obj.getBaseObjects())):
+        size = sizes[i % len(sizes)]
+        seconds = size if factor > 0 else 1.0 / size
+        # One guard point after the line, as for tables.
+        total += (int(seconds * sr + 0.5) + 1) * SAMPLE_BYTES
+    return total
+
+
+def measure(objects, outputs=0):
+    """
+    Return the footprint (as described in the module docstring) of a list
+    of pyo objects. C objects shared by several of them (views, tables) are
+    only counted once.
+
+    """
+    shared = set()
+    for table in tableCache.tables():
+        shared.update(id(b) for b in table.getBaseObjects())
+    bases = set()
+    report = {'objects': len(objects), 'baseObjects': 0, 'streams': 0,
+              'outputs': outputs, 'tableBytes': 0, 'sharedBytes': 0,
+              'delayBytes': 0, 'unsized': 0,
+              'classes': collections.Counter()}
+    for obj in objects:
+        report['classes'][type(obj).__name__] += 1
+        isTable = isinstance(obj, PyoTableObject)
+        for base in obj.getBaseObjects():
+            if id(base) in bases:
+                continue
+            bases.add(id(base))
+            report['baseObjects'] += 1
+            if isTable:
+                size = (base.getSize() + 1) * SAMPLE_BYTES
+                report['tableBytes'] += size
+                if id(base) in shared:
+                    report['sharedBytes'] += size
+            elif isinstance(obj, PyoObject):
+                report['streams'] += 1
+        if isinstance(obj, PyoObject):
+            delay = _delayBytes(obj, obj.getServer().getSamplingRate())
+            if delay is None:
+                report['unsized'] += 1
+            else:
+                report['delayBytes'] += delay
+    report['classes'] = dict(report['classes'])
+    return report
+
+
+def footprint(instrument, exclude=None):
+    """
+    Return the footprint of `instrument` (an instrument, or any pyo object):
+    everything it holds, but what its constructor arguments hold, or what
+    `exclude` (a list of objects) holds if given.
+
+    """
+    if exclude is None:
+        exclude = _arguments(instrument)
+    external = _walk(exclude)
+    objects = _walk([instrument], external + list(exclude))
+    return measure(objects, len(instrument.getBaseObjects()))
+
+
+def serverFootprint(server=None):
+    """
+    Return the footprint of every live pyo object, plus the number of
+    streams the `server` (if given) is processing, as 'serverStreams'.
+
+    """
+    gc.collect()
+    objects = [obj for obj in gc.get_objects() if _isPyo(obj)]
+    report = measure(objects)
+    if server is not None:
+        report['serverStreams'] = server.getNumberOfStreams()
+    return report
+
+
+def formatFootprint(report):
+    """Return a footprint as a few lines of text."""
+    lines = ["{objects} objects, {baseObjects} C objects, {streams} streams "
+             "({outputs} out)".format(**report),
+             "tables {0:.1f} KiB ({1:.1f} KiB shared), delay lines {2:.1f} "
+             "KiB".format(report['tableBytes'] / 1024.0,
+                          report['sharedBytes'] / 1024.0,
+                          report['delayBytes'] / 1024.0)]
+    if 'serverStreams' in report:
+        lines.append("{serverStreams} streams on the server"
+                     .format(**report))
+    if report['unsized']:
+        lines.append("{unsized} objects with unsized delay lines"
+                     .format(**report))
+    lines.append(", ".join("{0} {1}".format(n, name) for name, n
+                           in sorted(report['classes'].items())))
+    return "\n".join(lines)
+
+
+# Run this script to report the footprint of one voice of every instrument.
+if __name__ == "__main__":
+    from pyo import Delay, Metro, Server, Sig
+    from ground_state.pyo.instruments.aqueous import Aqueous
+    from ground_state.pyo.instruments.whale import Whale
+
+    s = Server(audio='manual', duplex=0).boot()
+    freq = Sig(110)
+    trig = Metro(3.776).play()
+    aqueous = Aqueous(freq, dur=3.776)
+    whale = Whale(freq, trig, dur=3.776)
+    delay = Delay(whale, delay=3.776, feedback=0.64, maxdelay=3.776)
+    for name, obj in [('Aqueous', aqueous), ('Whale', whale),
+                      ('Delay', delay)]:
+        print("{0}:\n{1}\n".format(name, formatFootprint(footprint(obj))))
+    print("Server:\n{0}".format(formatFootprint(serverFootprint(s))))
@@ -0,0 +1,165 @@
+# encoding: utf-8
+
+# This is a gain staging module for pyo <http://code.google.com/p/pyo>,
+# converting between log10 dBFS and linear amplitude. Latest version available
+# from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+dB <-> amplitude conversions, for numbers, lists and NumPy arrays, and at
+audio rate.
+Use it thusly:
+    'levels = dbToAmp([-12.0, -7.95, -3.0])'
+    'fader = DbSig(-12.0, time=0.05)'
+    'a = Aqueous(snap, dur=t.whole * 2, mul=fader)'
+    'fader.value = -6.0'.
+
+Numbers give numbers, lists (or tuples) give lists and arrays give arrays;
+each sequence is converted in one vectorized call.
+"""
+import math
+
+import numpy as np
+
+from pyo import PyoObject, DBToA, SigTo
+
+# Levels at or below this are silence, for `ampToDb`.
+DB_FLOOR = -120.0
+
+# NumPy's `exp` is vectorized; it beats both `power` and a lookup table.
+_LN10_20 = math.log(10) / 20.0
+
+
+def _convert(x, func):
+    # internal function applying the array function `func` to `x`, and
+    # returning the result as the same kind of thing `x` is
+    if isinstance(x, np.ndarray):
+        return func(x.astype(np.float64, copy=False))
+    result = func(np.asarray(x, dtype=np.float64))
+    if result.ndim == 0:
+        return float(result)
+    return result.tolist()
+
+
+def dbToAmp(db):
+    """
+    Return the linear amplitude of `db` (dBFS): a number, list or array.
+
+    >>> dbToAmp(-6.0)
+    0.501187...
+    >>> dbToAmp([0.0, -6.0])
+    [1.0, 0.501187...]
+
+    """
+    if isinstance(db, (int, float)):
+        return math.pow(10, 0.05 * db)
+    return _convert(db, lambda a: np.exp(a * _LN10_20))
+
+
+def ampToDb(amp, floor=DB_FLOOR):
+    """
+    Return the level in dBFS of the linear amplitude `amp`: a number, list or
+    array. The sign of `amp` is ignored, and levels are clipped to `floor`.
+
+    """
+    if isinstance(amp, (int, float)):
+        amp = abs(amp)
+        if amp <= 0:
+            return floor
+        return max(floor, 20.0 * math.log10(amp))
+
+    def func(a):
+        with np.errstate(divide='ignore'):
+            return np.maximum(20.0 * np.log10(np.abs(a)), floor)
+    return _convert(amp, func)
+
+
+class DbSig(PyoObject):
+    """
+    Level control in dB, at audio rate.
+
+    Outputs the linear amplitude of a level given in dBFS. Changes of level
+    are ramped linearly in dB over `time` seconds, the way a fader moves, and
+    converted by `DBToA` for every sample; no Python runs per block.
+
+    Signal chain:
+    value -> ramp (dB) -> DBToA -> out
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        value : float or PyoObject, optional
+            Level in dBFS. Defaults to 0.
+        time : float, optional
+            Ramp time, in seconds, for changes of `value`. Defaults to 0.025.
+
+    >>> s = Server().boot()
+    >>> s.start()
+    >>> fader = DbSig(-20.0, time=2)
+    >>> a = Sine(440, mul=fader).out()
+    >>> fader.value = -6.0
+
+    """
+    def __init__(self, value=0.0, time=0.025, mul=1, add=0):
+        PyoObject.__init__(self, mul, add)
+        self._value = value
+        self._time = time
+        self._mul = mul
+        self._add = add
+
+        init = value if isinstance(value, (int, float)) else 0.0
+        self._ramp = SigTo(value, time=time, init=init)
+        self._amp = DBToA(self._ramp, mul=self._mul, add=self._add)
+        self._base_objs = self._amp.getBaseObjects()
+
+    def setValue(self, x):
+        """
+        Replace the `value` attribute.
+
+        :Args:
+
+            x : float or PyoObject
+                New level in dBFS.
+
+        """
+        self._value = x
+        self._ramp.value = x
+
+    def setTime(self, x):
+        """
+        Replace the `time` attribute.
+
+        :Args:
+
+            x : float
+                New ramp time, in seconds.
+
+        """
+        self._time = x
+        self._ramp.time = x
+
+    @property
+    def value(self):
+        """float or PyoObject. Level in dBFS."""
+        return self._value
+
+    @value.setter
+    def value(self, x):
+        self.setValue(x)
+
+    @property
+    def time(self):
+        """float. Ramp time, in seconds."""
+        return self._time
+
+    @time.setter
+    def time(self, x):
+        self.setTime(x)
+
+    def __dir__(self):
+        return ["value", "time", "mul", "add"]
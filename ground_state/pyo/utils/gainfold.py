@@ -0,0 +1,185 @@
+# encoding: utf-8
+
+# This is a utility class for pyo <http://code.google.com/p/pyo>, which folds
+# constant gain stages into the `mul` of other objects. Latest version
+# available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+import gc
+
+
+class GainFolder(object):
+    """
+    GainFolder 1.0
+
+    Named constant gains ("dummy amplitude knobs"), folded into the `mul` of
+    the objects they scale rather than processed as `x * 1.0` objects of
+    their own. Changing a gain re-applies the product of every gain folded
+    into each affected object, so the knobs stay tweakable.
+
+    >>> gains = GainFolder()
+    >>> gains.gain('level', 0.7079)
+    >>> gains.gain('send', 0.63)
+    >>> env = Adsr(1.280, 0.097, 0.95, 0.577)
+    >>> gains.fold(env, ['level', 'send'])
+    >>> gains.setGain('send', 0.5)
+
+    """
+    def __init__(self):
+        self._gains = {}
+        self._folds = []
+        # (names, nodes saved) of every fold, for `folded`.
+        self._saved = []
+
+    def gain(self, name, value):
+        """Declare the gain `name` with its initial `value`."""
+        self._gains[name] = value
+
+    def fold(self, obj, names, scale=1.0):
+        """
+        Set the `mul` of `obj` to `scale` times the product of `names`.
+
+        Every gain folded saves one node (a `x * gain` object) per stream of
+        `obj`.
+
+        :Args:
+
+            obj : PyoObject
+                Object whose `mul` absorbs the gains.
+            names : list of str
+                Gains to fold.
+            scale : float, optional
+                Constant factor which isn't a knob. Defaults to 1.
+
+        """
+        fold = (obj, list(names), scale)
+        self._folds.append(fold)
+        self._saved.append((list(names), len(names) * len(obj)))
+        self._apply(fold)
+
+    def absorb(self, obj, names, nodes=1):
+        """
+        Record that the caller set the `mul` of `obj` to absorb `names`
+        (e.g. a volume or envelope given as a PyoObject, which can't be a
+        gain), saving `nodes` nodes per stream of `obj`.
+
+        :Args:
+
+            obj : PyoObject
+                Object whose `mul` absorbs the stages.
+            names : list of str
+                Names of the stages absorbed.
+            nodes : int, optional
+                Nodes saved per stream. Defaults to 1.
+
+        """
+        self._saved.append((list(names), nodes * len(obj)))
+
+    def folded(self):
+        """
+        Return a list of (names, nodes saved) for every fold, from `fold`
+        or `absorb`.
+
+        """
+        return list(self._saved)
+
+    def _apply(self, fold):
+        # internal method pushing the folded product into an object's `mul`
+        obj, names, scale = fold
+        for name in names:
+            scale *= self._gains[name]
+        obj.mul = scale
+
+    def setGain(self, name, x):
+        """
+        Change the gain `name`, and update every object it is folded into.
+
+        :Args:
+
+            name : str
+                Name of the gain.
+            x : float
+                New value.
+
+        """
+        if name not in self._gains:
+            raise KeyError("unknown gain {0!r}".format(name))
+        self._gains[name] = x
+        for fold in self._folds:
+            if name in fold[1]:
+                self._apply(fold)
+
+    def getGain(self, name):
+        """Return the current value of the gain `name`."""
+        return self._gains[name]
+
+    def gains(self):
+        """Return a dict of every gain and its current value."""
+        return dict(self._gains)
+
+
+def countNodes(server, build):
+    """
+    Return the number of audio streams the server gains while `build` runs.
+
+    The objects built are kept alive until the count is taken, then
+    released.
+
+    """
+    gc.collect()
+    before = server.getNumberOfStreams()
+    built = build()
+    gc.collect()
+    count = server.getNumberOfStreams() - before
+    del built
+    gc.collect()
+    return count
+
+
+def foldReport(server):
+    """
+    Return a dict mapping 'Aqueous' and 'Whale' to their node counts before
+    ('before') and after ('after') gain folding, the number of nodes
+    removed ('removed'), and the stages folded ('folded', a list of lists
+    of names), as recorded by each instrument's `GainFolder`.
+
+    `freq` is driven by a `Sig`, as it is by `Snap` in the songs.
+
+    """
+    from pyo import Metro, Sig
+    from ground_state.pyo.instruments.aqueous import Aqueous
+    from ground_state.pyo.instruments.whale import Whale
+
+    freq = Sig(440)
+    trig = Metro(1)
+    builds = {'Aqueous': lambda: Aqueous(freq),
+              'Whale': lambda: Whale(freq, trig)}
+    report = {}
+    for name, build in sorted(builds.items()):
+        folds = []
+
+        def built():
+            instrument = build()
+            folds.extend(instrument.folds)
+            return instrument
+        after = countNodes(server, built)
+        removed = sum(nodes for names, nodes in folds)
+        report[name] = {'before': after + removed, 'after': after,
+                        'removed': removed,
+                        'folded': [names for names, nodes in folds]}
+    return report
+
+
+# Run this script to report the nodes removed by gain folding.
+if __name__ == "__main__":
+    from pyo import Server
+
+    s = Server(audio='manual', duplex=0).boot()
+    for name, counts in sorted(foldReport(s).items()):
+        print("{0}: {1[before]} -> {1[after]} nodes ({1[removed]} removed; "
+              "folded {2})".format(name, counts, "; ".join(
+                  " * ".join(names) for names in counts['folded'])))
@@ -0,0 +1,137 @@
+# encoding: utf-8
+
+# This is a utility class for pyo <http://code.google.com/p/pyo>, which stops
+# an instrument's internal chain while the instrument is silent. Latest
+# version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+
+
+class IdleGate(object):
+    """
+    IdleGate 1.0
+
+    Stops a set of objects (an instrument's oscillators and filters) once its
+    envelopes have finished, and plays them again on the next note. Stopped
+    objects aren't processed at all, so an instrument which sounds a quarter
+    of the time costs about a quarter as much.
+
+    `sleep` stops the objects after `tail` seconds, which lets the block in
+    progress and any filter ringing finish. `wake` plays them again; called
+    from a `TrigFunc` created before them, it takes effect within the very
+    block of the trigger, so notes still start on their exact sample. Both
+    are meant to be hooked to the instrument's own triggers, so no Python
+    runs between notes.
+
+    With several `voices` (multichannel instruments), every object with one
+    stream per voice is gated voice by voice, through `sleep(voice)` and
+    `wake(voice)`; objects shared by the voices only sleep once all of the
+    voices do.
+
+    >>> gate = IdleGate([self._osc, self._eq], tail=0.05)
+    >>> self._wake = TrigFunc(trig, gate.wake)
+    >>> self._sleep = TrigFunc(env['trig'], gate.sleep)
+
+    """
+    def __init__(self, objects, tail=0.05, voices=1):
+        self._tail = tail
+        self._voices = voices
+        self._server = objects[0].getServer()
+        self._bufsize = self._server.getBufferSize()
+        # Streams gated per voice, and objects gated as a whole.
+        self._streams = [[] for i in range(voices)]
+        self._shared = []
+        for obj in objects:
+            streams = obj.getBaseObjects()
+            if len(streams) == voices:
+                for i, stream in enumerate(streams):
+                    self._streams[i].append(stream)
+            else:
+                self._shared.append(obj)
+        self._sharedNodes = sum(len(obj.getBaseObjects())
+                                for obj in self._shared)
+        self._asleep = [False] * voices
+        self._since = [0] * voices
+        self._sharedSince = 0
+        self._skipped = 0
+        self.enabled = True
+
+    def _now(self):
+        # internal method returning the server time, in samples
+        return self._server.getCurrentTimeInSamples()
+
+    def _blocksSince(self, since):
+        # internal method returning the blocks since objects stopped
+        tail = int(self._tail * self._server.getSamplingRate())
+        return max(0, (self._now() - since - tail) // self._bufsize)
+
+    def _voiceList(self, voice):
+        # internal method returning the voices to act on
+        if voice is None:
+            return range(self._voices)
+        return [voice]
+
+    def sleep(self, voice=None):
+        """Stop the objects of `voice` (or of every voice), after `tail`."""
+        if not self.enabled:
+            return
+        now = self._now()
+        for i in self._voiceList(voice):
+            if self._asleep[i]:
+                continue
+            for stream in self._streams[i]:
+                stream.stop(self._tail)
+            self._asleep[i] = True
+            self._since[i] = now
+        if self._shared and all(self._asleep):
+            for obj in self._shared:
+                obj.stop(wait=self._tail)
+            self._sharedSince = now
+
+    def wake(self, voice=None):
+        """Play the objects of `voice` (or of every voice) again."""
+        if self._shared and all(self._asleep):
+            for obj in self._shared:
+                obj.play()
+            self._skipped += (self._blocksSince(self._sharedSince) *
+                              self._sharedNodes)
+        for i in self._voiceList(voice):
+            if not self._asleep[i]:
+                continue
+            for stream in self._streams[i]:
+                stream.play()
+            self._skipped += (self._blocksSince(self._since[i]) *
+                              len(self._streams[i]))
+            self._asleep[i] = False
+
+    @property
+    def asleep(self):
+        """bool. Whether every voice is stopped, or about to be."""
+        return all(self._asleep)
+
+    @property
+    def voices(self):
+        """int. Number of voices."""
+        return self._voices
+
+    @property
+    def nodes(self):
+        """int. Number of audio streams gated."""
+        return (sum(len(streams) for streams in self._streams) +
+                self._sharedNodes)
+
+    @property
+    def skipped(self):
+        """int. Node-blocks not processed so far (streams x blocks)."""
+        skipped = self._skipped
+        for i in range(self._voices):
+            if self._asleep[i]:
+                skipped += (self._blocksSince(self._since[i]) *
+                            len(self._streams[i]))
+        if self._shared and all(self._asleep):
+            skipped += self._blocksSince(self._sharedSince) * self._sharedNodes
+        return skipped
@@ -0,0 +1,373 @@
+# encoding: utf-8
+
+# This is a loudness and level meter for pyo <http://code.google.com/p/pyo>
+# renders. Latest version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Measure loudness and levels of a render while it is rendered.
+Use it thusly:
+    'meter = LevelMeter(44100, 2, stems={'whale': whale, 'reverb': rev})'
+    'for block in blocks:'
+    '    meter.write(block)'
+    'print(formatLevels(meter.report()))'
+or, for a song script:
+    'python -m ground_state.pyo.utils.render orca.py -o orca.wav'
+    '    --levels orca.levels.json --stem whale --stem reverb'.
+
+Every block is measured as it comes, and nothing but running sums and one
+value per 100 ms is kept, so the audio is never read twice:
+    'integrated'    loudness over the whole render, in LUFS (ITU-R BS.1770-4,
+                    gated).
+    'momentaryMax'  loudest 400 ms, in LUFS.
+    'shortTermMax'  loudest 3 s, in LUFS.
+    'range'         loudness range, in LU (EBU Tech 3342).
+    'truePeak'      peak of the signal reconstructed at 4 times the sampling
+                    rate, in dBTP.
+    'channels'      sample 'peak', 'truePeak' and 'rms' of every channel, in
+                    dBFS (dBTP for true peaks).
+    'stems'         RMS of every stem given, in dBFS.
+    'shortTerm'     short-term loudness every second, in LUFS.
+
+Loudness is measured on K-weighted channels, all weighted 1 (left, right,
+centre; surround channels aren't told apart). The K-weighting filters are
+run on chunks of samples as matrix products: within a sub-block, a
+filter's output is its impulse response convolved with the sub-block, plus
+the response to the state left by the previous one, and those states are
+themselves carried from sub-block to sub-block as one product. Stems are
+measured by pyo `RMS` objects, which lag one block behind.
+"""
+import json
+import math
+
+import numpy as np
+
+from pyo import RMS
+from ground_state.pyo.utils.gain import DB_FLOOR, ampToDb
+
+# Samples measured at once, and, within those, run through the K-weighting
+# filters as one matrix product.
+CHUNK = 4096
+SUB_BLOCK = 64
+# Gating blocks are 400 ms long, every 100 ms.
+STEP = 0.1
+MOMENTARY = 4
+SHORT_TERM = 30
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+RANGE_GATE = -20.0
+# True peak oversampling, and taps per phase of its interpolation filter.
+OVERSAMPLING = 4
+TAPS = 12
+
+
+def kWeighting(sr):
+    """
+    Return the two (b, a) biquads of BS.1770's K-weighting filter at the
+    sampling rate `sr`: a high shelf, then a high pass.
+
+    """
+    # As drawn by libebur128, for any rate; at 48 kHz, the standard's own
+    # coefficients.
+    f0, gain, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = math.tan(math.pi * f0 / sr)
+    vh = 10 ** (gain / 20.0)
+    vb = vh ** 0.4996667741545416
+    a0 = 1.0 + k / q + k * k
+    shelf = ([(vh + vb * k / q + k * k) / a0, 2.0 * (k * k - vh) / a0,
+              (vh - vb * k / q + k * k) / a0],
+             [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0])
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = math.tan(math.pi * f0 / sr)
+    a0 = 1.0 + k / q + k * k
+    highpass = ([1.0, -2.0, 1.0],
+                [1.0, 2.0 * (k * k - 1.0) / a0, (1.0 - k / q + k * k) / a0])
+    return [shelf, highpass]
+
+
+class _BlockBiquad(object):
+    # internal class running a biquad over every channel of a signal at
+    # once, `size` samples by `size` samples, and `blocks` such sub-blocks
+    # at a time
+    def __init__(self, b, a, channels, size=SUB_BLOCK,
+                 blocks=CHUNK // SUB_BLOCK):
+        b0, b1, b2 = b
+        a1, a2 = a[1], a[2]
+        # Transposed direct form II, as a state space model.
+        A = np.array([[-a1, 1.0], [-a2, 0.0]])
+        B = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        self._size = size
+        self._blocks = blocks
+        powers = [np.eye(2)]
+        for i in range(size):
+            powers.append(A.dot(powers[-1]))
+        self._powers = np.array(powers)
+        # Response to the state, and state left by every input sample.
+        self._fromState = self._powers[:size, 0, :]
+        self._toState = self._powers[:size].dot(B)
+        impulse = np.concatenate([[b0], self._fromState[:size - 1].dot(B)])
+        i = np.arange(size)
+        lag = i[:, None] - i[None, :]
+        self._response = np.where(lag >= 0, impulse[np.maximum(lag, 0)], 0.0)
+        # Sub-block `m` starts with the state left by every earlier one,
+        # carried through those after it.
+        steps = [np.eye(2)]
+        for i in range(blocks):
+            steps.append(self._powers[size].dot(steps[-1]))
+        self._steps = np.array(steps)
+        m = np.arange(blocks)
+        lag = m[:, None] - m[None, :] - 1
+        carry = np.where((lag >= 0)[:, :, None, None],
+                         self._steps[np.maximum(lag, 0)], 0.0)
+        # As (block, state, block, state), to be sliced and flattened.
+        self._carry = carry.transpose(0, 2, 1, 3)
+        self._state = np.zeros((2, channels))
+
+    def _whole(self, x):
+        # internal method filtering whole sub-blocks, `blocks` at most
+        m = len(x) // self._size
+        channels = x.shape[1]
+        # One column per sub-block and channel, so that each step is a
+        # single matrix product.
+        x = x.reshape(m, self._size, channels).transpose(1, 0, 2)
+        x = x.reshape(self._size, m * channels)
+        y = self._response.dot(x)
+        # State each sub-block leaves, from a zero state.
+        ends = self._toState[::-1].T.dot(x).reshape(2, m, channels)
+        ends = ends.transpose(1, 0, 2)
+        carry = self._carry[:m, :, :m, :].reshape(2 * m, 2 * m)
+        starts = (carry.dot(ends.reshape(2 * m, channels)).reshape(ends.shape)
+                  + np.matmul(self._steps[:m], self._state))
+        y += self._fromState.dot(
+            starts.transpose(1, 0, 2).reshape(2, m * channels))
+        self._state = self._steps[1].dot(starts[-1]) + ends[-1]
+        y = y.reshape(self._size, m, channels).transpose(1, 0, 2)
+        return y.reshape(m * self._size, channels)
+
+    def _part(self, x):
+        # internal method filtering less than a sub-block
+        n = len(x)
+        y = (self._response[:n, :n].dot(x) +
+             self._fromState[:n].dot(self._state))
+        self._state = (self._powers[n].dot(self._state) +
+                       self._toState[:n][::-1].T.dot(x))
+        return y
+
+    def process(self, x):
+        if len(x) == 0:
+            return x
+        whole = len(x) - len(x) % self._size
+        stride = self._size * self._blocks
+        y = [self._whole(x[i:min(i + stride, whole)])
+             for i in range(0, whole, stride)]
+        if whole < len(x):
+            y.append(self._part(x[whole:]))
+        return np.concatenate(y)
+
+
+def _truePeakTaps():
+    # internal function returning the interpolation filter of the true peak
+    # meter, as a (TAPS, OVERSAMPLING) array: one column per phase, taps
+    # from the oldest sample on
+    n = np.arange(TAPS * OVERSAMPLING) - (TAPS * OVERSAMPLING - 1) / 2.0
+    h = np.sinc(n / OVERSAMPLING) * np.kaiser(len(n), 8.0)
+    phases = h.reshape(TAPS, OVERSAMPLING)
+    # Every phase passes DC untouched.
+    return phases[::-1] / phases.sum(axis=0)
+
+
+class LevelMeter(object):
+    """
+    LevelMeter 1.0
+
+    Loudness, peaks and RMS of a render, measured a block at a time. See
+    the module docstring.
+
+    :Args:
+
+        sr : float
+            Sampling rate.
+        nchnls : int
+            Number of channels.
+        stems : dict, optional
+            PyoObjects to measure the RMS of, by name. Their levels are read
+            at every `write`, which must come after every block. Defaults to
+            None.
+
+    """
+    def __init__(self, sr, nchnls, stems=None):
+        self._sr = sr
+        self._nchnls = nchnls
+        self._filters = [_BlockBiquad(b, a, nchnls)
+                         for b, a in kWeighting(sr)]
+        self._taps = _truePeakTaps()
+        self._history = np.zeros((TAPS - 1, nchnls))
+        self._chunk = np.empty((CHUNK, nchnls))
+        self._fill = 0
+        self._stepSize = int(round(sr * STEP))
+        self._stepSum = 0.0
+        self._stepFill = 0
+        # Mean square of the K-weighted channels, summed, every 100 ms.
+        self._steps = []
+        self._frames = 0
+        self._squares = np.zeros(nchnls)
+        self._peaks = np.zeros(nchnls)
+        self._truePeaks = np.zeros(nchnls)
+        self._stems = {}
+        self._stemSquares = {}
+        for name, stem in (stems or {}).items():
+            self._stems[name] = RMS(stem)
+            self._stemSquares[name] = 0.0
+        self._stemBlocks = 0
+
+    def write(self, block):
+        """Measure `block`, a (frames, nchnls) array (or interleaved)."""
+        x = np.asarray(block).reshape(-1, self._nchnls)
+        while len(x):
+            n = min(len(x), CHUNK - self._fill)
+            self._chunk[self._fill:self._fill + n] = x[:n]
+            self._fill += n
+            x = x[n:]
+            if self._fill == CHUNK:
+                self._measure()
+        if self._stems:
+            for name, rms in self._stems.items():
+                levels = np.asarray(rms.get(True), dtype=np.float64)
+                self._stemSquares[name] += float(np.mean(levels ** 2))
+            self._stemBlocks += 1
+
+    __call__ = write
+
+    def _measure(self):
+        # internal method measuring the samples gathered so far
+        x = self._chunk[:self._fill]
+        self._fill = 0
+        if len(x) == 0:
+            return
+        self._frames += len(x)
+        self._squares += np.einsum('ij,ij->j', x, x)
+        np.maximum(self._peaks, np.abs(x).max(axis=0), out=self._peaks)
+        self._truePeak(x)
+        self._loudness(x)
+
+    def _truePeak(self, x):
+        # internal method updating the true peaks with the block `x`
+        extended = np.concatenate([self._history, x])
+        for c in range(self._nchnls):
+            # Every phase at once, on a contiguous copy of the channel.
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.ascontiguousarray(extended[:, c]), TAPS)
+            upsampled = windows.dot(self._taps)
+            self._truePeaks[c] = max(self._truePeaks[c],
+                                     np.abs(upsampled).max())
+        self._history = extended[-(TAPS - 1):]
+
+    def _loudness(self, x):
+        # internal method adding the K-weighted energy of `x` to the 100 ms
+        # steps
+        for f in self._filters:
+            x = f.process(x)
+        squares = np.einsum('ij,ij->i', x, x)
+        while len(squares):
+            n = min(len(squares), self._stepSize - self._stepFill)
+            self._stepSum += float(squares[:n].sum())
+            self._stepFill += n
+            squares = squares[n:]
+            if self._stepFill == self._stepSize:
+                self._steps.append(self._stepSum / self._stepSize)
+                self._stepSum = 0.0
+                self._stepFill = 0
+
+    def _windows(self, length):
+        # internal method returning the mean square of every window of
+        # `length` steps, one per step
+        steps = np.asarray(self._steps)
+        if len(steps) < length:
+            return np.zeros(0)
+        sums = np.concatenate([[0.0], np.cumsum(steps)])
+        return (sums[length:] - sums[:-length]) / length
+
+    @staticmethod
+    def _lufs(z):
+        # internal function returning the loudness of mean squares `z`
+        with np.errstate(divide='ignore'):
+            return np.maximum(-0.691 + 10.0 * np.log10(z), DB_FLOOR)
+
+    def integrated(self):
+        """Return the gated loudness of everything so far, in LUFS."""
+        self._measure()
+        z = self._windows(MOMENTARY)
+        z = z[self._lufs(z) > ABSOLUTE_GATE]
+        if len(z) == 0:
+            return DB_FLOOR
+        gate = self._lufs(z.mean()) + RELATIVE_GATE
+        z = z[self._lufs(z) > gate]
+        return float(self._lufs(z.mean()))
+
+    def loudnessRange(self):
+        """Return the loudness range of everything so far, in LU."""
+        self._measure()
+        short = self._lufs(self._windows(SHORT_TERM))
+        short = short[short > ABSOLUTE_GATE]
+        if len(short) == 0:
+            return 0.0
+        gate = self._lufs(np.mean(10 ** ((short + 0.691) / 10.0)))
+        short = short[short > gate + RANGE_GATE]
+        low, high = np.percentile(short, [10, 95])
+        return float(high - low)
+
+    def report(self):
+        """Return the levels measured so far, as a dict (see the module)."""
+        self._measure()
+        momentary = self._lufs(self._windows(MOMENTARY))
+        short = self._lufs(self._windows(SHORT_TERM))
+        frames = max(self._frames, 1)
+        perSecond = int(round(1.0 / STEP))
+        return {
+            'dur': self._frames / float(self._sr),
+            'sr': self._sr,
+            'integrated': self.integrated(),
+            'momentaryMax': float(momentary.max()) if len(momentary)
+                            else DB_FLOOR,
+            'shortTermMax': float(short.max()) if len(short) else DB_FLOOR,
+            'range': self.loudnessRange(),
+            'truePeak': ampToDb(float(self._truePeaks.max())),
+            'channels': {
+                'peak': ampToDb(self._peaks.tolist()),
+                'truePeak': ampToDb(self._truePeaks.tolist()),
+                'rms': ampToDb(np.sqrt(self._squares / frames).tolist())},
+            'stems': dict(
+                (name, ampToDb(math.sqrt(total / max(self._stemBlocks, 1))))
+                for name, total in self._stemSquares.items()),
+            # The 3 s ending every whole second: window i ends at step
+            # i + SHORT_TERM, a whole second when i is.
+            'shortTerm': short[::perSecond].tolist()}
+
+    def save(self, filename):
+        """Write `report` to the JSON file `filename`, and return it."""
+        report = self.report()
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        return report
+
+
+def formatLevels(report):
+    """Return a level report as a few lines of text."""
+    lines = ["{integrated:.1f} LUFS integrated, {shortTermMax:.1f} LUFS "
+             "short-term max, {momentaryMax:.1f} LUFS momentary max, "
+             "{range:.1f} LU range".format(**report),
+             "true peak {0:.2f} dBTP ({1}), sample peak {2}, RMS {3}".format(
+                 report['truePeak'],
+                 ", ".join("{0:.2f}".format(x)
+                           for x in report['channels']['truePeak']),
+                 ", ".join("{0:.2f}".format(x)
+                           for x in report['channels']['peak']),
+                 ", ".join("{0:.2f}".format(x)
+                           for x in report['channels']['rms']))]
+    for name, level in sorted(report['stems'].items()):
+        lines.append("{0}: {1:.2f} dBFS RMS".format(name, level))
+    return "\n".join(lines)
@@ -0,0 +1,259 @@
+# encoding: utf-8
+
+# This is a compact preset store for Cecilia5 <http://ajaxsoundstudio.com>
+# modules built on pyo <http://code.google.com/p/pyo>. Latest version
+# available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Store a Cecilia module's presets with their automation curves as arrays.
+Call it thusly:
+    'python -m ground_state.pyo.utils.presets Pulsar.c5 -t 0.001'
+and, to read them back:
+    'store = PresetStore("Pulsar.presets.npz")'
+    'width = store.curve("last save", "width")'.
+
+Cecilia saves every `userGraph` curve as a list of [x, y] lists, one Python
+list and two floats per point. Here, each curve is simplified on save, then
+stored as an (n, 2) array of `dtype` in a `.npz` file, next to the rest of
+the presets (kept as a Python literal). On read, only the zip directory and
+the presets are loaded; a curve is read from the file the first time it is
+asked for.
+
+Simplification drops every point that a straight line between its kept
+neighbours gets within `tolerance` of, so that the curve read back is never
+further than `tolerance` from any original point (at the original point's
+x), plus the rounding of `dtype`. Curves are normalized (x and y from 0 to
+1), so a tolerance of 0.001 is a tenth of a percent of the parameter's range.
+"""
+import argparse
+import ast
+import os
+import pprint
+
+import numpy as np
+
+# Default tolerance, in normalized units.
+TOLERANCE = 0.001
+MARKER = 'CECILIA_PRESETS = '
+
+
+def simplify(points, tolerance=TOLERANCE):
+    """
+    Return the indices of the points of the polyline `points` (an (n, 2)
+    array of increasing x) to keep, so that interpolating between them is
+    within `tolerance` of every point dropped (Ramer-Douglas-Peucker, with
+    the error measured along y, since a curve is a function of x).
+
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 3:
+        return np.arange(n)
+    x, y = points[:, 0], points[:, 1]
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        dx = x[last] - x[first]
+        if dx > 0:
+            t = (x[inner] - x[first]) / dx
+        else:
+            t = np.zeros(last - first - 1)
+        error = np.abs(y[first] + t * (y[last] - y[first]) - y[inner])
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def maxError(original, simplified):
+    """
+    Return the largest distance along y between the points of `original`
+    and the polyline `simplified`.
+
+    """
+    original = np.asarray(original, dtype=np.float64)
+    simplified = np.asarray(simplified, dtype=np.float64)
+    if len(original) == 0:
+        return 0.0
+    y = np.interp(original[:, 0], simplified[:, 0], simplified[:, 1])
+    return float(np.max(np.abs(y - original[:, 1])))
+
+
+def readModulePresets(filename):
+    """Return the `CECILIA_PRESETS` dict of a Cecilia module file."""
+    with open(filename) as f:
+        source = f.read()
+    start = source.find(MARKER)
+    if start < 0:
+        raise ValueError("{0} has no CECILIA_PRESETS".format(filename))
+    return ast.literal_eval(source[start + len(MARKER):].strip())
+
+
+def writeModulePresets(filename, presets):
+    """Replace the `CECILIA_PRESETS` dict of a Cecilia module file."""
+    with open(filename) as f:
+        source = f.read()
+    start = source.find(MARKER)
+    if start < 0:
+        raise ValueError("{0} has no CECILIA_PRESETS".format(filename))
+    with open(filename, 'w') as f:
+        f.write(source[:start] + MARKER + pprint.pformat(presets) + '\n')
+
+
+def _curves(presets):
+    # internal function yielding (preset, graph, curve dict) for every
+    # automation curve of `presets`
+    for name in sorted(presets):
+        graphs = presets[name].get('userGraph', {})
+        for graph in sorted(graphs):
+            yield name, graph, graphs[graph]
+
+
+def savePresets(presets, filename, tolerance=TOLERANCE, dtype='float64'):
+    """
+    Save `presets` (as Cecilia stores them) to the `.npz` file `filename`,
+    with every curve simplified to `tolerance` and stored as `dtype`.
+
+    Returns a dict with the number of 'points' before and 'kept' after
+    simplification, and the largest 'error' introduced.
+
+    """
+    arrays = {}
+    stats = {'points': 0, 'kept': 0, 'error': 0.0}
+    skeleton = {}
+    for name, preset in presets.items():
+        skeleton[name] = dict(preset)
+        if 'userGraph' in preset:
+            skeleton[name]['userGraph'] = dict(
+                (graph, dict(curve))
+                for graph, curve in preset['userGraph'].items())
+    for i, (name, graph, curve) in enumerate(_curves(presets)):
+        points = np.asarray(curve['data'], dtype=np.float64).reshape(-1, 2)
+        kept = points[simplify(points, tolerance)].astype(dtype)
+        key = 'curve{0}'.format(i)
+        arrays[key] = kept
+        # The curve's data is replaced by the key of its array.
+        skeleton[name]['userGraph'][graph]['data'] = key
+        stats['points'] += len(points)
+        stats['kept'] += len(kept)
+        stats['error'] = max(stats['error'], maxError(points, kept))
+    arrays['presets'] = np.frombuffer(repr(skeleton).encode('utf-8'),
+                                      dtype=np.uint8)
+    # Keep the name as given; `np.savez` would add '.npz' to anything else.
+    with open(filename, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    return stats
+
+
+class PresetStore(object):
+    """
+    PresetStore 1.0
+
+    Presets saved by `savePresets`, read lazily: opening the store reads the
+    presets but none of the curves, which are read on first access and then
+    kept.
+
+    :Args:
+
+        filename : str
+            `.npz` file written by `savePresets`.
+
+    """
+    def __init__(self, filename):
+        self._file = np.load(filename)
+        self._presets = ast.literal_eval(
+            self._file['presets'].tobytes().decode('utf-8'))
+        self._curves = {}
+
+    def names(self):
+        """Return the preset names."""
+        return sorted(self._presets)
+
+    def graphs(self, name):
+        """Return the names of the curves of the preset `name`."""
+        return sorted(self._presets[name].get('userGraph', {}))
+
+    def curve(self, name, graph):
+        """Return the curve `graph` of the preset `name`, as an array."""
+        key = self._presets[name]['userGraph'][graph]['data']
+        if key not in self._curves:
+            self._curves[key] = self._file[key]
+        return self._curves[key]
+
+    def preset(self, name):
+        """
+        Return the preset `name` as Cecilia stores it, curves as lists of
+        [x, y] lists.
+
+        """
+        preset = dict(self._presets[name])
+        if 'userGraph' in preset:
+            preset['userGraph'] = dict(
+                (graph, dict(curve, data=self.curve(name, graph).tolist()))
+                for graph, curve in preset['userGraph'].items())
+        return preset
+
+    def presets(self):
+        """Return every preset, as Cecilia stores them."""
+        return dict((name, self.preset(name)) for name in self._presets)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def __contains__(self, name):
+        return name in self._presets
+
+    def __len__(self):
+        return len(self._presets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Store a Cecilia module's presets as compact arrays.")
+    parser.add_argument('module', help="Cecilia module, e.g. Pulsar.c5")
+    parser.add_argument('-o', '--output',
+                        help="store to write (default: <module>.presets.npz)")
+    parser.add_argument('-t', '--tolerance', type=float, default=TOLERANCE,
+                        help="largest error allowed on a curve, in "
+                             "normalized units (default: {0})"
+                             .format(TOLERANCE))
+    parser.add_argument('--float32', action='store_true',
+                        help="store curves as 32 bits floats")
+    parser.add_argument('--rewrite', action='store_true',
+                        help="also write the simplified curves back into "
+                             "the module")
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        output = os.path.splitext(args.module)[0] + '.presets.npz'
+    presets = readModulePresets(args.module)
+    stats = savePresets(presets, output, args.tolerance,
+                        'float32' if args.float32 else 'float64')
+    listBytes = len(repr(presets))
+    print("{points} points -> {kept} points, largest error {error:.2g}"
+          .format(**stats))
+    print("{0} bytes as a literal -> {1} bytes in {2}"
+          .format(listBytes, os.path.getsize(output), output))
+    if args.rewrite:
+        store = PresetStore(output)
+        writeModulePresets(args.module, store.presets())
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
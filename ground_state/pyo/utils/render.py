@@ -0,0 +1,390 @@
+# encoding: utf-8
+
+# This is an offline render engine for pyo <http://code.google.com/p/pyo>
+# songs. Latest version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Render a song script offline, as fast as the CPU allows.
+Call it thusly:
+    'python -m ground_state.pyo.utils.render orca.py -o orca.wav -d 120'
+or, to several files (formats) at once:
+    'python -m ground_state.pyo.utils.render orca.py -o orca.wav -o orca.ogg'.
+
+The song runs unmodified: while it is loaded, every `Server` it creates
+(directly, or through `serverSetup`) is a `RenderServer`, which always uses
+the offline backend, never opens a GUI, and holds off `start` until the
+whole graph has been built.
+
+With more than one output file, the song runs on the manual backend, and
+its output is streamed block by block to an `EncoderPipeline`, which encodes
+every file at the same time; the song is rendered only once. The same goes
+when levels are asked for ('--levels orca.levels.json', and '--stem whale'
+for every stem to meter): a `LevelMeter` measures every block on its way to
+the encoders.
+"""
+import argparse
+import contextlib
+import ctypes
+import functools
+import os
+import runpy
+import sys
+import time
+import traceback
+
+import numpy as np
+
+import pyo
+from pyo import Server
+from pyo.lib._core import USE_DOUBLE
+from ground_state.pyo.utils.encode import EncoderPipeline, formatReports
+from ground_state.pyo.utils.loudness import LevelMeter, formatLevels
+from ground_state.pyo.utils.trace import (Tracer, tracedCallbacks,
+                                          wrappedCallbacks)
+
+# Used when the song doesn't define `DURATION` and none is given.
+DEFAULT_DUR = 60.0
+
+
+class CallbackError(RuntimeError):
+    """
+    Raised once a render is over, if any of the song's `Pattern` or
+    `TrigFunc` callbacks raised during it. pyo only prints those; the
+    rendered file is incomplete, as far as the song is concerned.
+
+    """
+    def __init__(self, path, errors):
+        RuntimeError.__init__(
+            self, "{0} callback error(s) while rendering {1}; the first:\n{2}"
+            .format(len(errors), path, errors[0]))
+        self.errors = errors
+
+
+class RenderServer(Server):
+    """
+    Offline `Server` for rendering songs which expect a live one.
+
+    Whatever backend is asked for, the offline one is used (or the one in
+    `RenderServer.audio`, e.g. 'manual'). `gui` does nothing, and `start` is
+    deferred: rendering only begins on `render`. If `RenderServer.bufsize`
+    is set, it overrides the buffer size the song asks for. The process
+    callback set by the song is kept as `callback`.
+
+    """
+    # The most recently created instance, so the render engine can find the
+    # server a song created.
+    current = None
+    bufsize = None
+    audio = 'offline'
+
+    def __init__(self, sr=44100, nchnls=2, buffersize=256, duplex=0,
+                 audio='offline', **kwargs):
+        if RenderServer.bufsize is not None:
+            buffersize = RenderServer.bufsize
+        Server.__init__(self, sr=sr, nchnls=nchnls, buffersize=buffersize,
+                        duplex=0, audio=RenderServer.audio, **kwargs)
+        self.callback = None
+        RenderServer.current = self
+
+    def setCallback(self, callback):
+        Server.setCallback(self, callback)
+        self.callback = callback
+
+    def start(self):
+        # Deferred; see `render`.
+        return self
+
+    def gui(self, locals=None, meter=True, timer=True, exit=True,
+            title=None):
+        pass
+
+    def render(self):
+        """Render the graph to the file set with `recordOptions`."""
+        return Server.start(self)
+
+
+@contextlib.contextmanager
+def renderServers(bufsize=None, audio='offline'):
+    """
+    Make every `Server` created inside the block a `RenderServer`, using
+    `bufsize` (if given) as buffer size, and the `audio` backend: 'offline'
+    to render to a file, 'manual' to step through blocks with `process`.
+
+    Covers `pyo` and `serverSetup`, and `pyo64` if it is already loaded (a
+    later `from pyo64 import *` picks the names up from `pyo`).
+
+    """
+    from ground_state.pyo.utils import serverSetup
+    patched = [pyo, serverSetup]
+    if 'pyo64' in sys.modules:
+        patched.append(sys.modules['pyo64'])
+    saved = [(module, module.Server) for module in patched]
+    for module in patched:
+        module.Server = RenderServer
+    RenderServer.current = None
+    RenderServer.bufsize = bufsize
+    RenderServer.audio = audio
+    try:
+        yield
+    finally:
+        RenderServer.bufsize = None
+        RenderServer.audio = 'offline'
+        for module, server in saved:
+            module.Server = server
+
+
+def collectErrors(errors):
+    """
+    Return a function wrapping callbacks so that the traceback of every
+    exception they raise is appended to the list `errors` (the exception
+    is raised again, for pyo to print).
+
+    """
+    def wrap(function):
+        @functools.wraps(function)
+        def collected(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                errors.append(traceback.format_exc())
+                raise
+        return collected
+    return wrap
+
+
+def loadSong(path, bufsize=None, tracer=None, audio='offline', errors=None):
+    """
+    Run the song script at `path` and return its server and globals.
+
+    The graph is built, but nothing is rendered yet. `bufsize`, if given,
+    overrides the buffer size the song asks for. If a `Tracer` is given, the
+    song's `Pattern` and `TrigFunc` callbacks and the server's audio blocks
+    are traced. `audio` is the backend, as for `renderServers`. If a list is
+    given as `errors`, the traceback of every exception those callbacks
+    raise is appended to it.
+
+    """
+    path = os.path.abspath(path)
+    songDir = os.path.dirname(path)
+    sys.path.insert(0, songDir)
+    try:
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(renderServers(bufsize, audio))
+            if errors is not None:
+                stack.enter_context(wrappedCallbacks(collectErrors(errors)))
+            if tracer is not None:
+                stack.enter_context(tracedCallbacks(tracer))
+            songGlobals = runpy.run_path(path, run_name='__main__')
+            server = RenderServer.current
+    finally:
+        sys.path.remove(songDir)
+    if server is None:
+        raise RuntimeError("{0} didn't create a pyo Server".format(path))
+    if tracer is not None:
+        tracer.attach(server)
+    return server, songGlobals
+
+
+def renderSong(path, filename, dur=None, sampletype=0, quality=0.4,
+               bufsize=None, tracer=None):
+    """
+    Render the song script at `path` to `filename`, and return a report.
+
+    :Args:
+
+        path : str
+            Song script.
+        filename : str
+            Output file; its extension selects the file format.
+        dur : float, optional
+            Duration to render, in seconds. Defaults to the song's `DURATION`
+            if it has one, else `DEFAULT_DUR`.
+        sampletype : int, optional
+            Sample type, as for `Server.recordOptions`. Defaults to 16 bits.
+        quality : float, optional
+            Encoding quality for FLAC and OGG. Defaults to 0.4.
+        bufsize : int, optional
+            Buffer size, overriding the song's. Defaults to the song's.
+        tracer : Tracer, optional
+            Trace callbacks and audio blocks while rendering.
+
+    The report is a dict with the song, output file, rendered duration,
+    elapsed wall-clock and CPU time, real-time factor (rendered seconds per
+    second of wall-clock time), sampling rate and buffer size. Raises
+    `CallbackError` if any of the song's callbacks raised.
+
+    """
+    errors = []
+    server, songGlobals = loadSong(path, bufsize, tracer, errors=errors)
+    if dur is None:
+        dur = float(songGlobals.get('DURATION', DEFAULT_DUR))
+    server.recordOptions(dur=dur, filename=filename, sampletype=sampletype,
+                         quality=quality)
+    start = time.perf_counter()
+    cpuStart = time.process_time()
+    server.render()
+    cpu = time.process_time() - cpuStart
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise CallbackError(path, errors)
+    return {'song': path,
+            'file': filename,
+            'dur': dur,
+            'elapsed': elapsed,
+            'cpu': cpu,
+            'rtf': dur / elapsed if elapsed > 0 else float('inf'),
+            'sr': server.getSamplingRate(),
+            'bufsize': server.getBufferSize()}
+
+
+def outputBuffer(server):
+    """
+    Return the output block of a booted `server`, as a (bufsize, nchnls)
+    array. The array is a view on the server's own buffer: after every
+    `process`, it holds the block just processed (master gain included).
+
+    """
+    ctype = ctypes.c_double if USE_DOUBLE else ctypes.c_float
+    size = server.getBufferSize() * server.getNchnls()
+    address = int(server.getOutputAddr(), 16)
+    samples = np.ctypeslib.as_array((ctype * size).from_address(address))
+    return samples.reshape(-1, server.getNchnls())
+
+
+def streamSong(path, filenames, dur=None, sampletype=0, quality=0.4,
+               bufsize=None, tracer=None, taps=(), levels=False, stems=()):
+    """
+    Render the song script at `path` once, to every file of `filenames` at
+    the same time, and return a report.
+
+    Arguments are as for `renderSong`. `taps` are callables, each called
+    with every block (a (frames, nchnls) array, only valid during the call)
+    after it has been processed. If `levels` is true, or a filename, the
+    render is metered by a `LevelMeter`, along with the song's globals
+    named in `stems`, and the level report is written to `levels` if it is
+    a filename.
+
+    The report is that of `renderSong`, with a list of 'files' instead of
+    one 'file', the 'encoders' reports (see `Encoder.report`), and, when
+    metered, the 'levels' report (see `LevelMeter.report`). Raises
+    `CallbackError` if any of the song's callbacks raised.
+
+    """
+    errors = []
+    server, songGlobals = loadSong(path, bufsize, tracer, audio='manual',
+                                   errors=errors)
+    if dur is None:
+        dur = float(songGlobals.get('DURATION', DEFAULT_DUR))
+    sr = server.getSamplingRate()
+    bufsize = server.getBufferSize()
+    output = outputBuffer(server)
+    frames = int(round(dur * sr))
+    meter = None
+    if levels or stems:
+        missing = [name for name in stems if name not in songGlobals]
+        if missing:
+            raise ValueError("{0} has no stem named {1}"
+                             .format(path, ", ".join(missing)))
+        meter = LevelMeter(sr, server.getNchnls(),
+                           dict((name, songGlobals[name]) for name in stems))
+        taps = list(taps) + [meter.write]
+    pipeline = EncoderPipeline(filenames, sr, server.getNchnls(),
+                               sampletype, quality)
+    start = time.perf_counter()
+    cpuStart = time.process_time()
+    with pipeline:
+        Server.start(server)
+        for first in range(0, frames, bufsize):
+            server.process()
+            # The last block is cut to the duration asked for.
+            block = output[:frames - first]
+            for tap in taps:
+                tap(block)
+            pipeline.write(block)
+        server.stop()
+    cpu = time.process_time() - cpuStart
+    elapsed = time.perf_counter() - start
+    report = {'song': path,
+              'files': pipeline.filenames,
+              'dur': dur,
+              'elapsed': elapsed,
+              'cpu': cpu,
+              'rtf': dur / elapsed if elapsed > 0 else float('inf'),
+              'sr': sr,
+              'bufsize': bufsize,
+              'encoders': pipeline.close()}
+    if errors:
+        raise CallbackError(path, errors)
+    if meter is not None:
+        if isinstance(levels, str):
+            report['levels'] = meter.save(levels)
+        else:
+            report['levels'] = meter.report()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render a pyo song script offline.")
+    parser.add_argument('song', help="song script, e.g. orca.py")
+    parser.add_argument('-o', '--output', action='append',
+                        help="output file, repeated to encode several at "
+                             "once (default: <song>.wav)")
+    parser.add_argument('-d', '--dur', type=float,
+                        help="seconds to render (default: the song's "
+                             "DURATION, else {0})".format(DEFAULT_DUR))
+    parser.add_argument('-t', '--sampletype', type=int, default=0,
+                        help="sample type, as for Server.recordOptions "
+                             "(default: 0, 16 bits int)")
+    parser.add_argument('-q', '--quality', type=float, default=0.4,
+                        help="FLAC/OGG encoding quality (default: 0.4)")
+    parser.add_argument('-b', '--bufsize', type=int,
+                        help="buffer size (default: the song's)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="write a Chrome trace of the song's callbacks "
+                             "and audio blocks to FILE")
+    parser.add_argument('--levels', metavar='FILE',
+                        help="meter loudness, peaks and RMS while rendering, "
+                             "and write the level report to FILE (JSON)")
+    parser.add_argument('--stem', action='append', default=[],
+                        metavar='NAME',
+                        help="also meter the RMS of the song's global NAME; "
+                             "repeat for every stem")
+    args = parser.parse_args(argv)
+
+    outputs = args.output
+    if outputs is None:
+        outputs = [os.path.splitext(os.path.basename(args.song))[0] + '.wav']
+    tracer = Tracer() if args.trace else None
+    try:
+        if len(outputs) == 1 and not (args.levels or args.stem):
+            report = renderSong(args.song, outputs[0], args.dur,
+                                args.sampletype, args.quality, args.bufsize,
+                                tracer)
+        else:
+            report = streamSong(args.song, outputs, args.dur,
+                                args.sampletype, args.quality, args.bufsize,
+                                tracer, levels=args.levels, stems=args.stem)
+            report['file'] = ", ".join(report['files'])
+    except CallbackError as e:
+        if tracer is not None:
+            tracer.export(args.trace)
+        parser.exit(1, "{0}\n".format(e))
+    print("Rendered {dur:.3f}s of {song} to {file} in {elapsed:.3f}s "
+          "({rtf:.1f}x real time, sr={sr:.0f}, bufsize={bufsize})"
+          .format(**report))
+    if 'encoders' in report:
+        print(formatReports(report['encoders']))
+    if 'levels' in report:
+        print(formatLevels(report['levels']))
+    if tracer is not None:
+        tracer.export(args.trace)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,31 @@
 pyo Server setup.
 Call it thusly:
     's = serverSetup(10, dbToAmp(-8.79))'.
+or, with the buffer size and sampling rate found by `calibrate`:
+    's = serverSetup(10, profile="orca.profile")'.
+or headless, stepping through blocks with `s.process()` (see `driver`):
+    's = serverSetup(None, 256, 'manual')'.
 """
 from pyo import Server
 
 
 # Server setup..
-def serverSetup(device, bufsize, api='portaudio', amp=1.0):
-    _s = Server(sr=48000, nchnls=2, buffersize=bufsize, duplex=0, audio=api)
-    _s.setOutputDevice(device)
+def serverSetup(device, bufsize=None, api='portaudio', amp=1.0, profile=None,
+                sr=None):
+    if profile is not None:
+        from ground_state.pyo.utils.calibrate import loadProfile
+        settings = loadProfile(profile)
+        if bufsize is None:
+            bufsize = settings['bufsize']
+        if sr is None:
+            sr = settings.get('sr')
+    if sr is None:
+        sr = 48000
+    if bufsize is None:
+        raise ValueError("serverSetup needs a bufsize or a profile")
+    _s = Server(sr=sr, nchnls=2, buffersize=bufsize, duplex=0, audio=api)
+    if api != 'manual':
+        _s.setOutputDevice(device)
     _s.setAmp(amp)
     _s.boot()
     _s.start()
@@ -0,0 +1,286 @@
+# encoding: utf-8
+
+# This is a parameter sweep farm for pyo <http://code.google.com/p/pyo>
+# "instruments". Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Render many variants of an instrument offline, in parallel.
+Call it thusly:
+    'python -m ground_state.pyo.utils.sweep aqueous -n 200 -o sweeps'.
+
+Every variant is a set of parameter values, taken from a grid or sampled at
+random from a parameter space, rendered in its own worker process (pyo only
+allows one server per process) and analysed. The results go into
+`index.json` next to the rendered files.
+
+Parameter names are resolved against the instrument:
+    'seed'              the server's global seed (drives TrigXnoiseMidi).
+    'mul'               the instrument's volume.
+    'gain:<name>'       an internal amplitude knob, through `setGain`.
+    '<object>.<attr>'   an attribute of one of the instrument's objects,
+                        e.g. 'reson1Env.attack' or 'reson1.q'.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+import wave
+
+import numpy as np
+
+# Parameter spaces. A list is a set of choices; a tuple is a (min, max)
+# range, sampled uniformly (grids use both of its ends).
+SPACES = {
+    'aqueous': {
+        'reson1Env.attack': (0.6, 2.0),
+        'reson1Env.release': (0.3, 1.2),
+        'reson2Env.attack': (0.6, 2.0),
+        'ampEnv.attack': (0.2, 1.0),
+        'ampEnv.release': (0.6, 2.5),
+        'reson1.q': (20, 200),
+        'reson2.q': (20, 200),
+        'reson1.boost': (0.0, 6.0),
+        'reson2.boost': (0.0, 6.0),
+        'gain:reson1Out': (0.1, 0.6),
+        'gain:reson2Out': (0.2, 0.8),
+        'seed': list(range(1, 33)),
+    },
+    'whale': {
+        'lfoEnv.dur': (2.0, 6.0),
+        'lfo.freq': (2.0, 7.0),
+        'whale.q': (0.5, 4.0),
+        'mul': (0.5, 1.0),
+        'seed': list(range(1, 33)),
+    },
+}
+
+
+def grid(space):
+    """Return every combination of `space`, as a list of dicts."""
+    names = sorted(space)
+    values = [list(space[n]) for n in names]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def randomSample(space, n, seed=None):
+    """Return `n` random points of `space`, as a list of dicts."""
+    rng = random.Random(seed)
+    variants = []
+    for i in range(n):
+        variant = {}
+        for name, values in sorted(space.items()):
+            if isinstance(values, tuple):
+                variant[name] = rng.uniform(*values)
+            else:
+                variant[name] = rng.choice(values)
+        variants.append(variant)
+    return variants
+
+
+def _buildScene(instrument):
+    # internal function building the instrument the way the *-test.py
+    # scripts drive it, dry. Returns (instrument, objects to keep alive).
+    from pyo import Metro, Pattern, Snap, TrigXnoiseMidi
+    from ground_state.pyo.utils.tempo import Tempo
+    from ground_state.pyo.utils.dbToAmp import dbToAmp
+
+    t = Tempo(63.5)
+    if instrument == 'aqueous':
+        from ground_state.pyo.instruments.aqueous import Aqueous
+        metro = Metro(time=t.whole * 2).play()
+        note = TrigXnoiseMidi(metro, dist=0, mrange=(30, 77))
+        snap = Snap(note, choice=[0, 2, 4, 5, 7, 9, 11], scale=1)
+        inst = Aqueous(snap, dur=t.whole * 2, mul=dbToAmp(-12.0))
+        pattern = Pattern(function=inst.play, time=t.whole * 2).play()
+        return inst, [metro, note, snap, pattern]
+    if instrument == 'whale':
+        from ground_state.pyo.instruments.whale import Whale
+        metro = Metro(time=t.whole * 4).play()
+        note = TrigXnoiseMidi(metro, dist=0, mrange=(30, 41))
+        snap = Snap(note, choice=[0, 2, 4, 5, 7, 9, 11], scale=1)
+        inst = Whale(snap, metro, dur=t.whole, mul=0.9)
+        return inst, [metro, note, snap]
+    raise ValueError("unknown instrument {0!r}; expected one of {1}"
+                     .format(instrument, sorted(SPACES)))
+
+
+def applyParams(inst, params):
+    """Set every parameter of `params` but 'seed' on the instrument."""
+    for name, value in sorted(params.items()):
+        if name == 'seed':
+            continue
+        if name == 'mul':
+            inst.mul = value
+        elif name.startswith('gain:'):
+            inst.setGain(name[len('gain:'):], value)
+        else:
+            objName, attr = name.split('.', 1)
+            setattr(getattr(inst, '_' + objName), attr, value)
+
+
+def readWav(filename):
+    """Return the samples of a 16 bits WAV file as floats, and its rate."""
+    f = wave.open(filename, 'rb')
+    try:
+        sr = f.getframerate()
+        chnls = f.getnchannels()
+        data = np.frombuffer(f.readframes(f.getnframes()), dtype='<i2')
+    finally:
+        f.close()
+    return data.reshape(-1, chnls) / 32768.0, sr
+
+
+def features(samples, sr):
+    """
+    Return basic level and spectral features of `samples` (frames x chnls).
+
+    Levels are in dBFS: 'peak', 'rms' and 'crest' (peak over RMS). Spectral
+    features are computed on the mono sum: 'centroid' and 'rolloff' (the
+    frequency below which 85% of the energy lies), in Hz, and 'flatness'
+    (0 for a pure tone, 1 for white noise).
+
+    """
+    def db(x):
+        return 20 * np.log10(max(x, 1e-10))
+
+    mono = samples.mean(axis=1)
+    peak = float(np.abs(samples).max()) if samples.size else 0.0
+    rms = float(np.sqrt(np.mean(samples ** 2))) if samples.size else 0.0
+    power = np.abs(np.fft.rfft(mono)) ** 2
+    freqs = np.fft.rfftfreq(len(mono), 1.0 / sr)
+    total = power.sum()
+    if total > 0:
+        centroid = float((freqs * power).sum() / total)
+        rolloff = float(freqs[np.searchsorted(np.cumsum(power),
+                                              0.85 * total)])
+        flatness = float(np.exp(np.mean(np.log(power + 1e-20))) /
+                         np.mean(power + 1e-20))
+    else:
+        centroid = rolloff = flatness = 0.0
+    return {'peak': db(peak), 'rms': db(rms), 'crest': db(peak) - db(rms),
+            'centroid': centroid, 'rolloff': rolloff, 'flatness': flatness}
+
+
+def renderVariant(job):
+    """
+    Render and analyse one variant; meant to run in a worker process.
+
+    `job` is a dict with 'index', 'instrument', 'params', 'dur', 'filename',
+    'sr' and 'bufsize'. Returns the job's index, params and file, plus its
+    features and render time.
+
+    """
+    from pyo import Server
+
+    s = Server(sr=job['sr'], nchnls=2, buffersize=job['bufsize'], duplex=0,
+               audio='offline').boot()
+    s.setGlobalSeed(int(job['params'].get('seed', 1)))
+    inst, keep = _buildScene(job['instrument'])
+    applyParams(inst, job['params'])
+    out = inst.mix(2).out()
+    s.recordOptions(dur=job['dur'], filename=job['filename'])
+    start = time.perf_counter()
+    s.start()
+    elapsed = time.perf_counter() - start
+    s.shutdown()
+
+    samples, sr = readWav(job['filename'])
+    result = {'index': job['index'],
+              'params': job['params'],
+              'file': os.path.basename(job['filename']),
+              'elapsed': elapsed}
+    result.update(features(samples, sr))
+    return result
+
+
+def sweep(instrument, variants, outdir, dur=16.0, processes=None, sr=48000,
+          bufsize=256):
+    """
+    Render every variant of `instrument` into `outdir`, in a process pool.
+
+    Writes `outdir/index.json` (sorted by variant index) and returns the
+    list of results.
+
+    :Args:
+
+        instrument : str
+            'aqueous' or 'whale'.
+        variants : list of dict
+            Parameter values, e.g. from `grid` or `randomSample`.
+        outdir : str
+            Directory for the rendered files and the index.
+        dur : float, optional
+            Seconds to render per variant. Defaults to 16.
+        processes : int, optional
+            Number of worker processes. Defaults to the number of cores.
+
+    """
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    jobs = [{'index': i,
+             'instrument': instrument,
+             'params': params,
+             'dur': dur,
+             'filename': os.path.join(outdir, '{0}-{1:04d}.wav'
+                                      .format(instrument, i)),
+             'sr': sr,
+             'bufsize': bufsize} for i, params in enumerate(variants)]
+    # One task per worker: a fresh process, and so a fresh server, for every
+    # variant.
+    pool = multiprocessing.Pool(processes, maxtasksperchild=1)
+    try:
+        results = list(pool.imap_unordered(renderVariant, jobs))
+    finally:
+        pool.close()
+        pool.join()
+    results.sort(key=lambda r: r['index'])
+    with open(os.path.join(outdir, 'index.json'), 'w') as f:
+        json.dump({'instrument': instrument, 'dur': dur, 'sr': sr,
+                   'bufsize': bufsize, 'results': results}, f, indent=1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render parameter variants of an instrument offline.")
+    parser.add_argument('instrument', choices=sorted(SPACES))
+    parser.add_argument('-n', '--random', type=int, default=32,
+                        help="number of random variants (default: 32)")
+    parser.add_argument('-g', '--grid', action='store_true',
+                        help="render the full grid over the ends of every "
+                             "range instead (large!)")
+    parser.add_argument('-s', '--seed', type=int,
+                        help="seed for drawing random variants")
+    parser.add_argument('-o', '--outdir', default='sweep',
+                        help="output directory (default: sweep)")
+    parser.add_argument('-d', '--dur', type=float, default=16.0,
+                        help="seconds per variant (default: 16)")
+    parser.add_argument('-j', '--processes', type=int,
+                        help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    space = SPACES[args.instrument]
+    if args.grid:
+        variants = grid(space)
+    else:
+        variants = randomSample(space, args.random, args.seed)
+    start = time.perf_counter()
+    results = sweep(args.instrument, variants, args.outdir, args.dur,
+                    args.processes)
+    elapsed = time.perf_counter() - start
+    print("Rendered {0} variants of {1} in {2:.1f}s; index in {3}"
+          .format(len(results), args.instrument, elapsed,
+                  os.path.join(args.outdir, 'index.json')))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,7 +18,14 @@ class Tempo(object):
     """
 
     def __init__(self, bpm):
-        self.spb = 60.0 / bpm
+        self.__float__ = 0.0
+        self.setTempo(bpm)
+
+    def setTempo(self, bpm):
+        # bpm is BPM, example 120 beats per minute. Every note value is
+        # derived from it, so they are all recomputed.
+        self.bpm = bpm
+        self.spb = 60.0 / bpm  # seconds per beat.
         self.quarter = self.spb
         self.eighth = self.quarter / 2.0
         self.six10th = self.eighth / 2.0
@@ -27,8 +34,3 @@ class Tempo(object):
         self.one28th = self.sixty4th / 2.0
         self.whole = self.quarter * 4.0
         self.minim = self.quarter * 2.0
-        self.__float__ = 0.0
-
-    def setTempo(self, bpm):
-        # bpm is BPM, example 120 beats per minute.
-        self.spb = 60.0 / bpm  # seconds per beat.
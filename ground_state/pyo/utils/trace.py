@@ -0,0 +1,217 @@
+# encoding: utf-8
+
+# This is an event tracer for pyo <http://code.google.com/p/pyo>, recording
+# Python callbacks, note triggers and audio blocks on a timeline. Latest
+# version available from <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Trace when Python callbacks, note triggers and audio blocks happen.
+Use it thusly:
+    'tracer = Tracer()'
+    'tracer.attach(s)'
+    'p = Pattern(function=tracer.wrap(noteOn), time=t.whole * 2).play()'
+    'tracer.export("trace.json")'
+and open the file in chrome://tracing (or https://ui.perfetto.dev).
+
+Or, for a whole song:
+    'python -m ground_state.pyo.utils.render orca.py --trace trace.json'.
+
+Events are kept in a bounded ring buffer, so tracing a long render only
+keeps its most recent events.
+"""
+import collections
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+class Tracer(object):
+    """
+    Tracer 1.0
+
+    Records timestamped events into a ring buffer of `capacity` events, and
+    exports them in the Chrome trace-event format.
+
+    Callbacks are recorded as complete events (start and duration), note
+    triggers and audio blocks as instant events. Block events carry the
+    server time in samples, so audio time can be lined up against wall-clock
+    time.
+
+    """
+    def __init__(self, capacity=65536):
+        self._events = collections.deque(maxlen=capacity)
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._server = None
+        self.enabled = True
+
+    def _now(self):
+        # internal method returning microseconds since the tracer was made
+        return (time.perf_counter_ns() - self._origin) / 1000.0
+
+    def _record(self, event):
+        # internal method appending an event, with its process and thread
+        event['pid'] = self._pid
+        event['tid'] = threading.get_ident()
+        self._events.append(event)
+
+    def wrap(self, function, name=None, cat='callback'):
+        """
+        Return `function` wrapped to record each of its calls.
+
+        :Args:
+
+            function : callable
+                Function to trace.
+            name : str, optional
+                Event name. Defaults to the function's name.
+            cat : str, optional
+                Event category. Defaults to 'callback'.
+
+        """
+        if name is None:
+            name = getattr(function, '__name__', repr(function))
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            start = self._now()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._record({'name': name, 'cat': cat, 'ph': 'X',
+                              'ts': start, 'dur': self._now() - start})
+        return traced
+
+    def instant(self, name, cat='note', args=None):
+        """Record an instant event, e.g. a note trigger."""
+        if not self.enabled:
+            return
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't',
+                 'ts': self._now()}
+        if args:
+            event['args'] = args
+        self._record(event)
+
+    def traceTrig(self, trig, name='trig'):
+        """
+        Record an instant event for every trigger of the PyoObject `trig`.
+
+        Returns the `TrigFunc` doing it, which must be kept alive. Note that
+        this runs Python on every trigger.
+
+        """
+        from pyo import TrigFunc
+        return TrigFunc(trig, self.instant, arg=name)
+
+    def attach(self, server):
+        """
+        Record an instant event at the start of every audio block of
+        `server`, through its process callback.
+
+        The server's own process callback keeps being called, after the
+        event is recorded: the one already set if the server keeps it as
+        `callback` (a `RenderServer` does), and any set afterwards.
+
+        """
+        self._server = server
+        callback = [getattr(server, 'callback', None)]
+
+        def block():
+            if self.enabled:
+                self._record({'name': 'block', 'cat': 'audio', 'ph': 'i',
+                              's': 'g', 'ts': self._now(),
+                              'args': {'sample':
+                                       server.getCurrentTimeInSamples()}})
+            if callback[0] is not None:
+                callback[0]()
+
+        def setCallback(function):
+            # Chained to, rather than replacing the tracer's callback.
+            callback[0] = function
+        type(server).setCallback(server, block)
+        server.setCallback = setCallback
+
+    def events(self):
+        """Return a list of the recorded events, oldest first."""
+        return list(self._events)
+
+    def clear(self):
+        """Forget every recorded event."""
+        self._events.clear()
+
+    def export(self, filename):
+        """Write the recorded events to `filename`, as Chrome trace JSON."""
+        meta = [{'name': 'process_name', 'ph': 'M', 'pid': self._pid,
+                 'tid': 0, 'args': {'name': os.path.basename(sys.argv[0])}}]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': meta + self.events(),
+                       'displayTimeUnit': 'ms'}, f)
+
+
+@contextlib.contextmanager
+def wrappedCallbacks(wrap):
+    """
+    Make every `Pattern` and `TrigFunc` created inside the block call its
+    function through `wrap(function)`, which returns the callable to use.
+
+    Covers `pyo`, and `pyo64` if it is already loaded.
+
+    """
+    import pyo
+    from pyo import Pattern, TrigFunc
+
+    def wrapAll(function):
+        # Both accept a list of functions, one per stream.
+        if isinstance(function, (list, tuple)):
+            return [wrap(f) for f in function]
+        return wrap(function)
+
+    class WrappedPattern(Pattern):
+        def __init__(self, function, time=1, arg=None):
+            Pattern.__init__(self, wrapAll(function), time, arg)
+
+        def setFunction(self, x):
+            Pattern.setFunction(self, wrapAll(x))
+
+    class WrappedTrigFunc(TrigFunc):
+        def __init__(self, input, function, arg=None):
+            TrigFunc.__init__(self, input, wrapAll(function), arg)
+
+        def setFunction(self, x):
+            TrigFunc.setFunction(self, wrapAll(x))
+
+    patched = [pyo]
+    if 'pyo64' in sys.modules:
+        patched.append(sys.modules['pyo64'])
+    saved = [(module, module.Pattern, module.TrigFunc) for module in patched]
+    for module in patched:
+        module.Pattern = WrappedPattern
+        module.TrigFunc = WrappedTrigFunc
+    try:
+        yield
+    finally:
+        for module, pattern, trigFunc in saved:
+            module.Pattern = pattern
+            module.TrigFunc = trigFunc
+
+
+def tracedCallbacks(tracer):
+    """
+    Make every `Pattern` and `TrigFunc` created inside the block record its
+    calls with `tracer`.
+
+    Covers `pyo`, and `pyo64` if it is already loaded.
+
+    """
+    return wrappedCallbacks(tracer.wrap)
@@ -0,0 +1,384 @@
+# encoding: utf-8
+
+# This is a tuning module for pyo <http://code.google.com/p/pyo>, mapping note
+# numbers to frequencies in arbitrary scales. Latest version available from
+# <http://gist.github.com/tildebyte>.
+# Copyright (C) 2014  Ben Alkov <ground_state@quaestor.us>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version <http://www.gnu.org/licenses/>.
+"""
+Scales as sets of ratios, and note number to frequency lookup.
+Use it thusly:
+    'note = TrigXnoiseMidi(metro, dist=0, mrange=(30, 77))'
+    'freq = Tune(note, "just", choice=[0, 2, 4, 5, 7, 9, 11])'
+    'a = Aqueous(freq, dur=t.whole * 2)'.
+
+Note numbers step through the degrees of the scale, one degree per number,
+so a 12 step scale lines up with MIDI, and a 22 step one (shruti) spans 22
+note numbers per octave. The frequencies of every note number (0 to 127) are
+computed once into a table, shared through the table cache; at audio rate,
+`Tune` is a single table lookup.
+"""
+import weakref
+
+from pyo import PyoObject, DataTable, TableIndex
+from ground_state.pyo.generators.tablecache import tableCache
+
+# Middle C, for note 60.
+ROOT = 261.6256
+ROOT_NOTE = 60
+NOTES = 128
+
+
+class Scale(object):
+    """
+    Scale 1.0
+
+    A scale, as the ratios of its degrees to the root, within one period
+    (usually the octave). The first ratio must be 1; a last ratio equal to
+    the period is dropped, so both ways of writing a scale work.
+
+    >>> fifths = Scale([1.0, 9.0 / 8, 81.0 / 64, 3.0 / 2, 27.0 / 16, 2.0])
+    >>> fifths.steps
+    5
+    >>> fifths.frequency(62, root=261.6256)
+    331.1199
+
+    """
+    def __init__(self, ratios, period=2.0, name=None):
+        ratios = sorted(float(r) for r in ratios)
+        if abs(ratios[-1] - period) < 1e-9:
+            ratios.pop()
+        if not ratios or abs(ratios[0] - 1.0) > 1e-9:
+            raise ValueError("the first ratio of a scale must be 1")
+        if ratios[-1] >= period:
+            raise ValueError("every ratio must be less than the period")
+        self._ratios = tuple(ratios)
+        self._period = float(period)
+        self.name = name
+
+    @classmethod
+    def edo(cls, n, period=2.0):
+        """Return the scale of `n` equal divisions of `period`."""
+        return cls([period ** (i / float(n)) for i in range(n)], period,
+                   '{0}edo'.format(n))
+
+    @property
+    def ratios(self):
+        """tuple. Ratio of every degree to the root, within one period."""
+        return self._ratios
+
+    @property
+    def period(self):
+        """float. Ratio at which the scale repeats."""
+        return self._period
+
+    @property
+    def steps(self):
+        """int. Number of degrees per period."""
+        return len(self._ratios)
+
+    def ratio(self, degree):
+        """Return the ratio to the root of `degree`, which may be negative."""
+        period, step = divmod(int(degree), self.steps)
+        return self._period ** period * self._ratios[step]
+
+    def frequency(self, note, root=ROOT, rootNote=ROOT_NOTE):
+        """Return the frequency of `note`, `rootNote` sounding at `root`."""
+        return root * self.ratio(note - rootNote)
+
+    def quantize(self, degree, choice):
+        """
+        Return the degree nearest to `degree` among the degrees `choice`
+        (of the first period, as for `Snap`) and their transpositions. Ties
+        go to the lower one.
+
+        """
+        steps = self.steps
+        base = degree - degree % steps
+        candidates = [base + c % steps + p * steps
+                      for c in choice for p in (-1, 0, 1)]
+        return min(candidates, key=lambda d: (abs(d - degree), d))
+
+    def frequencies(self, root=ROOT, rootNote=ROOT_NOTE, choice=None,
+                    notes=NOTES):
+        """
+        Return the frequency of every note number from 0 to `notes` - 1.
+
+        :Args:
+
+            root : float, optional
+                Frequency of `rootNote`. Defaults to middle C, 261.6256 Hz.
+            rootNote : int, optional
+                Note number of the root. Defaults to 60.
+            choice : list of int, optional
+                Only use these degrees; every other note is snapped to the
+                nearest of them. Defaults to every degree.
+            notes : int, optional
+                Number of note numbers. Defaults to 128.
+
+        """
+        freqs = []
+        for note in range(notes):
+            degree = note - rootNote
+            if choice:
+                degree = self.quantize(degree, choice)
+            freqs.append(root * self.ratio(degree))
+        return freqs
+
+    def __len__(self):
+        return self.steps
+
+    def __repr__(self):
+        return 'Scale({0!r}, period={1!r}, name={2!r})'.format(
+            list(self._ratios), self._period, self.name)
+
+
+# 22 shruti (srutis) of Indian classical music.
+SHRUTI = Scale([1.0, 256.0 / 243, 16.0 / 15, 10.0 / 9, 9.0 / 8, 32.0 / 27,
+                6.0 / 5, 5.0 / 4, 81.0 / 64, 4.0 / 3, 27.0 / 20, 45.0 / 32,
+                729.0 / 512, 3.0 / 2, 128.0 / 81, 8.0 / 5, 5.0 / 3,
+                27.0 / 16, 16.0 / 9, 9.0 / 5, 15.0 / 8, 243.0 / 128],
+               name='shruti')
+# 12 tone, 5-limit just intonation.
+JUST = Scale([1.0, 16.0 / 15, 9.0 / 8, 6.0 / 5, 5.0 / 4, 4.0 / 3, 45.0 / 32,
+              3.0 / 2, 8.0 / 5, 5.0 / 3, 9.0 / 5, 15.0 / 8], name='just')
+# 12 tone, stacked pure fifths.
+PYTHAGOREAN = Scale([1.0, 256.0 / 243, 9.0 / 8, 32.0 / 27, 81.0 / 64,
+                     4.0 / 3, 729.0 / 512, 3.0 / 2, 128.0 / 81, 27.0 / 16,
+                     16.0 / 9, 243.0 / 128], name='pythagorean')
+EDO12 = Scale.edo(12)
+
+SCALES = dict((scale.name, scale)
+              for scale in [SHRUTI, JUST, PYTHAGOREAN, EDO12])
+
+
+def getScale(scale):
+    """Return `scale` if it is a `Scale`, else the named scale or EDO."""
+    if isinstance(scale, Scale):
+        return scale
+    if scale in SCALES:
+        return SCALES[scale]
+    if isinstance(scale, str) and scale.endswith('edo'):
+        return Scale.edo(int(scale[:-len('edo')]))
+    raise ValueError("unknown scale {0!r}; expected a Scale, 'Nedo' or one "
+                     "of {1}".format(scale, sorted(SCALES)))
+
+
+def tuningKey(scale, root=ROOT, rootNote=ROOT_NOTE, choice=None):
+    """Return the table cache key for a frequency table."""
+    scale = getScale(scale)
+    return ('tuning', scale.ratios, scale.period, float(root), int(rootNote),
+            tuple(choice) if choice else None)
+
+
+def frequencyTable(scale, root=ROOT, rootNote=ROOT_NOTE, choice=None,
+                   owner=None):
+    """
+    Return the shared table of the frequency of every note number, for the
+    given tuning. Arguments are as for `Scale.frequencies`; `scale` may also
+    be a scale name. The table must be treated as read-only.
+
+    """
+    scale = getScale(scale)
+
+    def factory():
+        return DataTable(NOTES, init=scale.frequencies(root, rootNote,
+                                                       choice))
+
+    return tableCache.acquire(tuningKey(scale, root, rootNote, choice),
+                              factory, owner)
+
+
+class Tune(PyoObject):
+    """
+    Note number to frequency quantizer.
+
+    Maps a stream of note numbers (such as the output of `TrigXnoiseMidi`)
+    to tuned frequencies, through one precomputed table lookup per sample.
+    Fractional note numbers are truncated; numbers outside 0 to 127 are
+    clipped.
+
+    :Parent: :py:class:`PyoObject`
+
+    :Args:
+
+        input : PyoObject
+            Note numbers.
+        scale : Scale or str, optional
+            Scale, or the name of one: 'shruti', 'just', 'pythagorean' or
+            'Nedo'. Defaults to '12edo'.
+        root : float, optional
+            Frequency of `rootNote`. Defaults to middle C, 261.6256 Hz.
+        rootNote : int, optional
+            Note number of the root. Defaults to 60.
+        choice : list of int, optional
+            Only use these degrees of the scale, as for `Snap`. Defaults to
+            every degree.
+
+    >>> s = Server().boot()
+    >>> s.start()
+    >>> note = TrigXnoiseMidi(Metro(.25).play(), dist=0, mrange=(48, 84))
+    >>> freq = Tune(note, 'shruti', rootNote=48)
+    >>> a = SineLoop(freq, feedback=0.1, mul=.2).out()
+
+    """
+    def __init__(self, input, scale='12edo', root=ROOT, rootNote=ROOT_NOTE,
+                 choice=None, mul=1, add=0):
+        PyoObject.__init__(self, mul, add)
+        self._input = input
+        self._scale = getScale(scale)
+        self._root = root
+        self._rootNote = rootNote
+        self._choice = choice
+        self._mul = mul
+        self._add = add
+
+        self._release = None
+        self._acquire()
+        self._lookup = TableIndex(self._table, input, mul=self._mul,
+                                  add=self._add)
+        self._base_objs = self._lookup.getBaseObjects()
+
+    def _acquire(self):
+        # internal method fetching the frequency table from the table cache
+        self._table = frequencyTable(self._scale, self._root, self._rootNote,
+                                     self._choice)
+        self._release = weakref.finalize(
+            self, tableCache.release,
+            tuningKey(self._scale, self._root, self._rootNote, self._choice))
+
+    def _retune(self):
+        # internal method swapping to the table of the current tuning. The
+        # old table is only released once nothing reads it any more.
+        release = self._release
+        self._acquire()
+        self._lookup.table = self._table
+        release()
+
+    def setInput(self, x):
+        """
+        Replace the `input` attribute.
+
+        :Args:
+
+            x : PyoObject
+                New note number stream.
+
+        """
+        self._input = x
+        self._lookup.index = x
+
+    def setScale(self, x):
+        """
+        Replace the `scale` attribute.
+
+        :Args:
+
+            x : Scale or str
+                New scale, or the name of one.
+
+        """
+        self._scale = getScale(x)
+        self._retune()
+
+    def setRoot(self, x):
+        """
+        Replace the `root` attribute.
+
+        :Args:
+
+            x : float
+                New frequency of the root note.
+
+        """
+        self._root = x
+        self._retune()
+
+    def setRootNote(self, x):
+        """
+        Replace the `rootNote` attribute.
+
+        :Args:
+
+            x : int
+                New note number of the root.
+
+        """
+        self._rootNote = x
+        self._retune()
+
+    def setChoice(self, x):
+        """
+        Replace the `choice` attribute.
+
+        :Args:
+
+            x : list of int
+                Degrees to use, or None for every degree.
+
+        """
+        self._choice = x
+        self._retune()
+
+    @property
+    def input(self):
+        """PyoObject. Note number stream."""
+        return self._input
+
+    @input.setter
+    def input(self, x):
+        self.setInput(x)
+
+    @property
+    def scale(self):
+        """Scale. Scale the notes are tuned to."""
+        return self._scale
+
+    @scale.setter
+    def scale(self, x):
+        self.setScale(x)
+
+    @property
+    def root(self):
+        """float. Frequency of the root note."""
+        return self._root
+
+    @root.setter
+    def root(self, x):
+        self.setRoot(x)
+
+    @property
+    def rootNote(self):
+        """int. Note number of the root."""
+        return self._rootNote
+
+    @rootNote.setter
+    def rootNote(self, x):
+        self.setRootNote(x)
+
+    @property
+    def choice(self):
+        """list of int. Degrees used, or None for every degree."""
+        return self._choice
+
+    @choice.setter
+    def choice(self, x):
+        self.setChoice(x)
+
+    @property
+    def table(self):
+        """DataTable. Frequency of every note number."""
+        return self._table
+
+    def __dir__(self):
+        return ["input", "root", "mul", "add"]
+
+
+# Run the script to print the shruti frequencies around middle C.
+if __name__ == "__main__":
+    for note in range(ROOT_NOTE - SHRUTI.steps, ROOT_NOTE + SHRUTI.steps + 1):
+        print("{0:4d}: {1:10.4f} Hz".format(note, SHRUTI.frequency(note)))
@@ -9,23 +9,29 @@
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation, either version 3 of the License, or
 # (at your option) any later version <http://www.gnu.org/licenses/>.
-from pyo import Delay, Metro, Pattern, Snap, STRev, TrigXnoiseMidi
+from pyo import Delay, Snap, STRev, TrigFunc, TrigXnoiseMidi
 
 # iPython: %cd \path\to\pyo\files
 from ground_state.pyo.instruments.aqueous import Aqueous
 from ground_state.pyo.instruments.whale import Whale
-from ground_state.pyo.utils.tempo import Tempo
+from ground_state.pyo.utils.clock import Clock
 from ground_state.pyo.utils.dbToAmp import dbToAmp
 from ground_state.pyo.utils.serverSetup import serverSetup
+from ground_state.pyo.utils.tempo import Tempo
 
 
-t = Tempo(63.5)  # q=944ms, w=3.776s
 # Windows
 # server = serverSetup(10, 700)
 # OSX
 server = serverSetup(2, 192, 'coreaudio')
-metroWhale = Metro(time=t.whole * 4).play()
-metroAqueous = Metro(time=t.whole).play()
+# Every trigger and delay time is derived from the one clock.
+clock = Clock(63.5).play()  # q=944ms, w=3.776s
+t = clock.tempo
+# The slowest tempo the clock may be set to; delay lines bound to the clock
+# are sized for it.
+slowest = Tempo(40.0)
+metroWhale = clock.division(16)
+metroAqueous = clock.division(4)
 noteWhale = TrigXnoiseMidi(metroWhale, dist=0, mrange=(30, 41))
 noteAqeous = TrigXnoiseMidi(metroAqueous, dist=0, mrange=(42, 83))
 snapWhale = Snap(noteWhale, choice=[0, 2, 4, 5, 7, 9, 11], scale=1)
@@ -37,9 +43,12 @@ aqueous = Aqueous(snapAqueous, dur=t.whole * 2, mul=dbToAmp(-12.0))
 def noteOn():
     aqueous.play()
 
-playAqueous = Pattern(function=noteOn, time=t.whole * 2).play()
+playAqueous = TrigFunc(clock.division(8), noteOn)
 delayWhale = Delay(whale, delay=t.whole, feedback=0.64,
-               maxdelay=t.whole, mul=dbToAmp(-6.0))
+               maxdelay=slowest.whole, mul=dbToAmp(-6.0))
+clock.bind(whale, 'dur', 4)
+clock.bind(aqueous, 'dur', 8)
+clock.bind(delayWhale, 'delay', 4)
 wetdry = delayWhale + whale + aqueous
 volume = wetdry * 1.0
 volume.setMul(dbToAmp(-3.0))
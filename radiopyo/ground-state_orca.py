@@ -140,6 +140,16 @@ class TriTable(PyoTableObject):
     def order(self, x):
         self.setOrder(x)
 
+# Envelope tables, built once per breakpoint list and size, and shared
+# (read-only) by every instrument and `TrigEnv` using them.
+envTables = {}
+
+def envTable(points, size=8192):
+    key = (tuple(points), size)
+    if key not in envTables:
+        envTables[key] = CosTable(points, size)
+    return envTables[key]
+
 class Whale(PyoObject):
     """
     Whale 1.0
@@ -175,14 +185,14 @@ class Whale(PyoObject):
         # LFO signal chain.
         # This envelope drives the LFO which creates the vibrato effect. Its
         # volume stays very low until just before it ends.
-        lfoEnvTable = CosTable([(0, 0.0), (2457, 0.0), (6481, 0.3),
+        lfoEnvTable = envTable([(0, 0.0), (2457, 0.0), (6481, 0.3),
                                 (7350, 0.0), (8191, 0.0)])
         # lfoEnvTable.graph()
         self._lfoEnv = TrigEnv(self._trig, lfoEnvTable, dur=self._dur)
         self._lfo = Sine(4.27, mul=self._lfoEnv)
 
         # Triangle oscillator signal chain.
-        triEnvTable = CosTable([(0, 0.0), (1535, 1.0), (2046, 0.95),
+        triEnvTable = envTable([(0, 0.0), (1535, 1.0), (2046, 0.95),
                                 (6143, 0.95), (8191, 0.0)])
         # triEnvTable.graph()
         self._triEnv = TrigEnv(self._trig, triEnvTable, dur=self._dur)
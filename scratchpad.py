@@ -3,6 +3,7 @@ from pyo import *  # Implicitly imports `random`?
 from ground_state.pyo.utils import Tempo
 from ground_state.pyo.utils import dbToAmp
 from ground_state.pyo.utils import serverSetup
+from ground_state.pyo.utils.events import EventScheduler
 
 
 # t = Tempo(63.5)  # q=944ms, w=3.776s
@@ -45,18 +46,21 @@ shruti = shruti_low[:-1] + shruti_high
 
 lead_note_index = 22
 accomp_note_index = 22
-lead_met = Metro(0.125)
-accomp_met = Metro(2)
+# The note walks are computed ahead of time on the scheduler's thread, not
+# in the audio callback.
+sched = EventScheduler(s)
+lead_freq = sched.lane(init=shruti[lead_note_index])
+accomp_freq = sched.lane(init=shruti[accomp_note_index])
 drone = SineLoop([shruti[0], shruti[0]], feedback=0.07).out()
-lead = SineLoop([shruti[lead_note_index], shruti[lead_note_index]], feedback=0.12, mul=dbToAmp(-4))
-accomp = SineLoop([shruti[accomp_note_index], shruti[accomp_note_index]], feedback=0.08, mul=dbToAmp(-8))
+lead = SineLoop([lead_freq, lead_freq], feedback=0.12, mul=dbToAmp(-4))
+accomp = SineLoop([accomp_freq, accomp_freq], feedback=0.08, mul=dbToAmp(-8))
 mm = Mixer(outs=1, chnls=2, time=.025)
 mm.addInput(0, lead)
 mm.addInput(1, accomp)
 mm.setAmp(0, 0, 0.5)
 mm.setAmp(1, 0, 0.5)
 
-def choose_lead_step():
+def choose_lead_step(when):
     global lead_note_index
     step = int(random.normalvariate(1, 3))
     lead_note_index += step
@@ -65,12 +69,12 @@ def choose_lead_step():
     if lead_note_index > len(shruti) - 1:
         lead_note_index = (len(shruti) - 1) - lead_note_index
     try:
-        lead.freq = [shruti[lead_note_index], shruti[lead_note_index]]
+        return shruti[lead_note_index]
     except:
         print('lead_note_index is {0}; step is {1}'.format(lead_note_index, step))
         raise
 
-def choose_accomp_step():
+def choose_accomp_step(when):
     global accomp_note_index
     step = int(random.normalvariate(1, 3))
     accomp_note_index += step
@@ -79,7 +83,7 @@ def choose_accomp_step():
     if accomp_note_index > len(shruti) - 1:
         accomp_note_index = (len(shruti) - 1) - accomp_note_index
     try:
-        accomp.freq = [shruti[accomp_note_index], shruti[accomp_note_index]]
+        return shruti[accomp_note_index]
     except:
         print('accomp_note_index is {0}; step is {1}'.format(accomp_note_index, step))
         raise
@@ -87,15 +91,15 @@ def choose_accomp_step():
 
 d = Delay(mm, delay=0.2, feedback=0.5, mul=0.4).out()
 
-lead_trig = TrigFunc(lead_met, choose_lead_step)
-accomp_trig = TrigFunc(accomp_met, choose_accomp_step)
-lead_met.play()
-accomp_met.play()
+sched.repeat(0.125, lead_freq, choose_lead_step)
+sched.repeat(2, accomp_freq, choose_accomp_step)
+sched.start()
 
 
 s.start()
 s.setAmp(dbToAmp(-40))
 
+sched.stop()
 s.stop()
 s.shutdown()
 s.reinit()